@@ -27,6 +27,9 @@ FS_TEMP_STORAGE = str(FRONTEND_SERVER_DIR / "temp_storage")
 
 COLLISION_BLOCK_ID = "32125"
 
+# Append-only JSONL log of every prompt/response pair, written when DEBUG is on
+PROMPT_LOG_PATH = os.getenv("PROMPT_LOG_PATH", str(BASE_DIR / "logs" / "prompt_log.jsonl"))
+
 # Debug flag
 DEBUG = True
 
@@ -2,4 +2,4 @@ from .service import LLMService
 from .cost_tracker import CostTracker
 from .interfaces import LLMProvider
 from .providers.openai_provider import OpenAIProvider
-from .errors import LLMError, LLMRetryableError, LLMFatalError
+from .errors import LLMError, LLMRetryableError, LLMTimeoutError, LLMFatalError
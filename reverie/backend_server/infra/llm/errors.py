@@ -6,6 +6,10 @@ class LLMRetryableError(LLMError):
     """Errors that can be retried (e.g., rate limits, timeouts)."""
     pass
 
+class LLMTimeoutError(LLMRetryableError):
+    """A request that got no response within its timeout."""
+    pass
+
 class LLMFatalError(LLMError):
     """Errors that should not be retried (e.g., invalid API key, bad request)."""
     pass
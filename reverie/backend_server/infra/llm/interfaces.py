@@ -25,15 +25,18 @@ class LLMProvider(ABC):
     @abstractmethod
     def completion(self, 
                    model: str, 
-                   prompt: str, 
+                   prompt: Union[str, List[str]], 
                    temperature: float = 0.7,
                    max_tokens: Optional[int] = None,
-                   **kwargs) -> Tuple[str, Dict[str, int]]:
+                   **kwargs) -> Tuple[Union[str, List[str]], Dict[str, int]]:
         """
         Execute a text completion request (legacy).
         
+        A list of prompts is sent as a single batched request; the contents
+        are then returned as a list aligned with the prompts.
+        
         Returns:
-            Tuple[str, Dict[str, int]]: The response content and usage statistics.
+            Tuple[Union[str, List[str]], Dict[str, int]]: The response content(s) and usage statistics.
         """
         pass
 
@@ -1,11 +1,67 @@
-import openai
+import atexit
+import threading
 from typing import List, Dict, Any, Optional, Union, Tuple
 from ..interfaces import LLMProvider
-from ..errors import LLMRetryableError, LLMFatalError
+from ..errors import LLMRetryableError, LLMTimeoutError, LLMFatalError
+
+# openai (with requests and the numpy-backed datalib it pulls in) takes a few
+# hundred ms to import. It is bound here on the first request instead, so
+# importing the prompt layer does not pay for it.
+openai = None
+api_requestor = None
+requests = None
+
+def _load_openai():
+    global openai, api_requestor, requests
+    if openai is None:
+        import requests as _requests
+        from openai import api_requestor as _api_requestor
+        import openai as _openai
+        requests, api_requestor = _requests, _api_requestor
+        openai = _openai
 
 class OpenAIProvider(LLMProvider):
-    def __init__(self, api_key: str):
-        openai.api_key = api_key
+    def __init__(self, api_key: str, max_connections: int = 64):
+        self._api_key = api_key
+        # The session is built on the first request rather than here, so
+        # importing the prompt layer (tests, tooling) never sets up a pool.
+        self._max_connections = max_connections
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @staticmethod
+    def _make_session(max_connections: int) -> "requests.Session":
+        """
+        Build one keep-alive connection pool to be shared by every thread
+        that calls the API. Mirrors openai's own session setup (proxy and
+        connection retries), with a pool sized for concurrent callers.
+        """
+        session = requests.Session()
+        proxies = api_requestor._requests_proxies_arg(openai.proxy)
+        if proxies:
+            session.proxies = proxies
+        session.mount(
+            "https://",
+            requests.adapters.HTTPAdapter(
+                pool_connections=max_connections,
+                pool_maxsize=max_connections,
+                max_retries=api_requestor.MAX_CONNECTION_RETRIES,
+            ),
+        )
+        return session
+
+    def _use_shared_session(self):
+        # openai 0.27 keeps its HTTP session in a thread-local and otherwise
+        # builds a new one (with new TCP/TLS connections) for each thread.
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    _load_openai()
+                    openai.api_key = self._api_key
+                    session = self._make_session(self._max_connections)
+                    atexit.register(session.close)
+                    self._session = session
+        api_requestor._thread_context.session = self._session
 
     def chat_completion(self, 
                         model: str, 
@@ -13,6 +69,7 @@ class OpenAIProvider(LLMProvider):
                         temperature: float = 0.7,
                         max_tokens: Optional[int] = None,
                         **kwargs) -> Tuple[str, Dict[str, int]]:
+        self._use_shared_session()
         try:
             response = openai.ChatCompletion.create(
                 model=model,
@@ -26,9 +83,10 @@ class OpenAIProvider(LLMProvider):
             usage = response.get("usage", {})
             return content, usage
 
+        except openai.error.Timeout as e:
+            raise LLMTimeoutError(f"OpenAI Timeout: {e}") from e
         except (openai.error.RateLimitError, 
                 openai.error.APIError, 
-                openai.error.Timeout, 
                 openai.error.ServiceUnavailableError) as e:
             raise LLMRetryableError(f"OpenAI Retryable Error: {e}") from e
         except Exception as e:
@@ -36,10 +94,11 @@ class OpenAIProvider(LLMProvider):
 
     def completion(self, 
                    model: str, 
-                   prompt: str, 
+                   prompt: Union[str, List[str]], 
                    temperature: float = 0.7,
                    max_tokens: Optional[int] = None,
-                   **kwargs) -> Tuple[str, Dict[str, int]]:
+                   **kwargs) -> Tuple[Union[str, List[str]], Dict[str, int]]:
+        self._use_shared_session()
         try:
             response = openai.Completion.create(
                 model=model,
@@ -49,13 +108,18 @@ class OpenAIProvider(LLMProvider):
                 **kwargs
             )
             
-            content = response.choices[0].text
             usage = response.get("usage", {})
-            return content, usage
+            if isinstance(prompt, str):
+                return response.choices[0].text, usage
+            # Choices of a batched request are not guaranteed to come back in
+            # prompt order; each carries the index of the prompt it answers.
+            choices = sorted(response.choices, key=lambda choice: choice["index"])
+            return [choice.text for choice in choices], usage
 
+        except openai.error.Timeout as e:
+            raise LLMTimeoutError(f"OpenAI Timeout: {e}") from e
         except (openai.error.RateLimitError, 
                 openai.error.APIError, 
-                openai.error.Timeout, 
                 openai.error.ServiceUnavailableError) as e:
             raise LLMRetryableError(f"OpenAI Retryable Error: {e}") from e
         except Exception as e:
@@ -64,6 +128,7 @@ class OpenAIProvider(LLMProvider):
     def embedding(self, 
                   text: Union[str, List[str]], 
                   model: str) -> Tuple[Union[List[float], List[List[float]]], Dict[str, int]]:
+        self._use_shared_session()
         try:
             response = openai.Embedding.create(
                 input=text,
@@ -77,9 +142,10 @@ class OpenAIProvider(LLMProvider):
                 return data[0]["embedding"], usage
             return [item["embedding"] for item in data], usage
 
+        except openai.error.Timeout as e:
+            raise LLMTimeoutError(f"OpenAI Timeout: {e}") from e
         except (openai.error.RateLimitError, 
                 openai.error.APIError, 
-                openai.error.Timeout, 
                 openai.error.ServiceUnavailableError) as e:
             raise LLMRetryableError(f"OpenAI Retryable Error: {e}") from e
         except Exception as e:
@@ -1,4 +1,5 @@
 import time
+import random
 import logging
 from typing import List, Dict, Any, Optional, Union
 from .interfaces import LLMProvider
@@ -22,17 +23,31 @@ class LLMService:
         self.retry_delay = retry_delay
         self.cost_tracker = CostTracker()
 
+    def backoff(self, retries: int) -> float:
+        """
+        Exponential backoff with jitter, so that requests which timed out
+        together (e.g. during a provider stall) do not all retry in lockstep.
+        """
+        return self.retry_delay * (2 ** (retries - 1)) * random.uniform(0.5, 1.5)
+
     def chat_completion(self, 
                         model: str, 
                         messages: List[Dict[str, str]], 
                         temperature: float = 0.7,
                         max_tokens: Optional[int] = None,
+                        max_retries: Optional[int] = None,
                         **kwargs) -> str:
         """
         Execute a chat completion request with retry logic and cost tracking.
+
+        max_retries overrides the service's retry count for this call.
+        Callers that run their own attempt loop pass 0, so that the two
+        loops do not multiply the number of requests.
         """
+        if max_retries is None:
+            max_retries = self.max_retries
         retries = 0
-        while retries <= self.max_retries:
+        while retries <= max_retries:
             try:
                 content, usage = self.provider.chat_completion(
                     model=model,
@@ -53,12 +68,12 @@ class LLMService:
 
             except LLMRetryableError as e:
                 retries += 1
-                if retries > self.max_retries:
-                    logger.error(f"LLM request failed after {self.max_retries} retries: {e}")
+                if retries > max_retries:
+                    logger.error(f"LLM request failed after {max_retries} retries: {e}")
                     raise e
                 
-                sleep_time = self.retry_delay * (2 ** (retries - 1)) # Exponential backoff
-                logger.warning(f"LLM request failed ({e}). Retrying in {sleep_time}s...")
+                sleep_time = self.backoff(retries)
+                logger.warning(f"LLM request failed ({e}). Retrying in {sleep_time:.1f}s...")
                 time.sleep(sleep_time)
             
             except Exception as e:
@@ -67,15 +82,24 @@ class LLMService:
 
     def completion(self, 
                    model: str, 
-                   prompt: str, 
+                   prompt: Union[str, List[str]], 
                    temperature: float = 0.7,
                    max_tokens: Optional[int] = None,
-                   **kwargs) -> str:
+                   max_retries: Optional[int] = None,
+                   **kwargs) -> Union[str, List[str]]:
         """
         Execute a text completion request with retry logic and cost tracking.
+        A list of prompts is sent as one request and yields a list of
+        contents aligned with it.
+
+        max_retries overrides the service's retry count for this call.
+        Callers that run their own attempt loop pass 0, so that the two
+        loops do not multiply the number of requests.
         """
+        if max_retries is None:
+            max_retries = self.max_retries
         retries = 0
-        while retries <= self.max_retries:
+        while retries <= max_retries:
             try:
                 content, usage = self.provider.completion(
                     model=model,
@@ -96,12 +120,12 @@ class LLMService:
 
             except LLMRetryableError as e:
                 retries += 1
-                if retries > self.max_retries:
-                    logger.error(f"LLM request failed after {self.max_retries} retries: {e}")
+                if retries > max_retries:
+                    logger.error(f"LLM request failed after {max_retries} retries: {e}")
                     raise e
                 
-                sleep_time = self.retry_delay * (2 ** (retries - 1)) # Exponential backoff
-                logger.warning(f"LLM request failed ({e}). Retrying in {sleep_time}s...")
+                sleep_time = self.backoff(retries)
+                logger.warning(f"LLM request failed ({e}). Retrying in {sleep_time:.1f}s...")
                 time.sleep(sleep_time)
             
             except Exception as e:
@@ -133,4 +157,4 @@ class LLMService:
                 retries += 1
                 if retries > self.max_retries:
                     raise e
-                time.sleep(self.retry_delay * (2 ** (retries - 1)))
+                time.sleep(self.backoff(retries))
@@ -1,5 +1,6 @@
+import sys
 from dataclasses import dataclass, field
-from typing import List, Optional, Set, Dict, Any, Tuple, Union
+from typing import List, Optional, Set, Dict, Any, Tuple, Union, NamedTuple
 from datetime import datetime
 from enum import Enum
 
@@ -50,6 +51,21 @@ class Action:
     def __getitem__(self, item):
         return (self.description, self.duration)[item]
 
+class EventTriple(NamedTuple):
+    """
+    A (subject, predicate, object) event triple.
+    
+    Every action and every object interaction emits one, so it is a plain 
+    tuple underneath: it compares, hashes and serializes like the tuples the 
+    rest of the code already passes around.
+    
+    Example:
+        triple = EventTriple("Isabella Rodriguez", "is", "brewing coffee")
+    """
+    subject: str
+    predicate: str
+    object: str
+
 @dataclass
 class PlanExecution:
     """
@@ -315,7 +331,12 @@ class WorldContext:
 # OUTPUT CONTRACTS - Explicit return types from cognitive modules
 # ==============================================================================
 
-@dataclass
+# Results are built once per step and then only read, so they are frozen, and 
+# slotted where the interpreter supports it (dataclass slots need 3.10+) to 
+# drop the per-instance __dict__.
+_OUTPUT_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+@dataclass(frozen=True, **_OUTPUT_SLOTS)
 class PerceptionResult:
     """
     Output from Perceiver module.
@@ -328,7 +349,7 @@ class PerceptionResult:
     ignored_events: List[str] = field(default_factory=list)  # Filtered out events
 
 
-@dataclass  
+@dataclass(frozen=True, **_OUTPUT_SLOTS)
 class RetrievalResult:
     """
     Output from Retriever for a single query/focal point.
@@ -341,7 +362,7 @@ class RetrievalResult:
     relevance_scores: Dict[str, float] = field(default_factory=dict)  # Memory ID -> score
 
 
-@dataclass
+@dataclass(frozen=True, **_OUTPUT_SLOTS)
 class PlanResult:
     """
     Output from Planner module.
@@ -371,7 +392,7 @@ class PlanResult:
     chat_end_time: Optional[datetime] = None
 
 
-@dataclass
+@dataclass(frozen=True, **_OUTPUT_SLOTS)
 class ReflectionResult:
     """
     Output from Reflector module.
@@ -385,7 +406,7 @@ class ReflectionResult:
     should_reset_counter: bool = False    # Whether to reset importance counter
 
 
-@dataclass
+@dataclass(frozen=True, **_OUTPUT_SLOTS)
 class ExecutionResult:
     """
     Output from Executor module.
@@ -399,7 +420,7 @@ class ExecutionResult:
     planned_path: List[Tuple[int, int]] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(frozen=True, **_OUTPUT_SLOTS)
 class ConversationResult:
     """
     Output from Converser module for a single conversation turn.
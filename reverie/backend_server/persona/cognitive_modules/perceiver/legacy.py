@@ -5,7 +5,9 @@ from typing import List, TYPE_CHECKING, Optional
 
 from .base import AbstractPerceiver
 from persona.prompt_template.gpt_structure import get_embedding
-from persona.prompt_template.run_gpt_prompt import run_gpt_prompt_event_poignancy, run_gpt_prompt_chat_poignancy
+from persona.prompt_template.run_gpt_prompt import (run_gpt_prompt_event_poignancy, 
+                                                    run_gpt_prompt_event_poignancy_batch, 
+                                                    run_gpt_prompt_chat_poignancy)
 from reverie.backend_server.models import PerceptionResult
 
 if TYPE_CHECKING:
@@ -103,7 +105,13 @@ class LegacyPerceiver(AbstractPerceiver):
         for dist, event in percept_events_list[:self.scratch.att_bandwidth]: 
             perceived_events += [event]
 
-        ret_events = []
+        # Work out which perceived events are new before touching memory, so 
+        # that all of their poignancy scores can be requested at once. 
+        # latest_events is the (s, p, o) of the last `retention` events; it is 
+        # advanced here exactly as add_event would advance it. 
+        latest_events = [e_node.spo_summary() for e_node in 
+                         self.scratch.a_mem.seq_event[:self.scratch.retention]]
+        new_events = []
         for p_event in perceived_events: 
             s, p, o, desc = p_event
             if not p: 
@@ -113,56 +121,61 @@ class LegacyPerceiver(AbstractPerceiver):
             desc = f"{s.split(':')[-1]} is {desc}"
             p_event = (s, p, o)
 
-            latest_events = self.scratch.a_mem.get_summarized_latest_events(
-                                            self.scratch.retention)
             if p_event not in latest_events:
-                keywords = set()
-                sub = p_event[0]
-                obj = p_event[2]
-                if ":" in p_event[0]: 
-                    sub = p_event[0].split(":")[-1]
-                if ":" in p_event[2]: 
-                    obj = p_event[2].split(":")[-1]
-                keywords.update([sub, obj])
-
                 desc_embedding_in = desc
                 if "(" in desc: 
                     desc_embedding_in = (desc_embedding_in.split("(")[1]
                                                         .split(")")[0]
                                                         .strip())
-                if desc_embedding_in in self.scratch.a_mem.embeddings: 
-                    event_embedding = self.scratch.a_mem.embeddings[desc_embedding_in]
+                new_events += [(s, p, o, desc, desc_embedding_in)]
+                latest_events = [p_event] + latest_events[:self.scratch.retention - 1]
+
+        poignancies = run_gpt_prompt_event_poignancy_batch(self.scratch, 
+                                [e[4] for e in new_events])[0]
+
+        ret_events = []
+        for (s, p, o, desc, desc_embedding_in), event_poignancy in zip(new_events, poignancies): 
+            p_event = (s, p, o)
+            keywords = set()
+            sub = p_event[0]
+            obj = p_event[2]
+            if ":" in p_event[0]: 
+                sub = p_event[0].split(":")[-1]
+            if ":" in p_event[2]: 
+                obj = p_event[2].split(":")[-1]
+            keywords.update([sub, obj])
+
+            if desc_embedding_in in self.scratch.a_mem.embeddings: 
+                event_embedding = self.scratch.a_mem.embeddings[desc_embedding_in]
+            else: 
+                event_embedding = get_embedding(desc_embedding_in)
+            event_embedding_pair = (desc_embedding_in, event_embedding)
+
+            chat_node_ids = []
+            if p_event[0] == f"{self.scratch.name}" and p_event[1] == "chat with": 
+                curr_event = self.scratch.act_event
+                if self.scratch.act_description in self.scratch.a_mem.embeddings: 
+                    chat_embedding = self.scratch.a_mem.embeddings[
+                                        self.scratch.act_description]
                 else: 
-                    event_embedding = get_embedding(desc_embedding_in)
-                event_embedding_pair = (desc_embedding_in, event_embedding)
-                
-                event_poignancy = self._generate_poig_score("event", desc_embedding_in)
-
-                chat_node_ids = []
-                if p_event[0] == f"{self.scratch.name}" and p_event[1] == "chat with": 
-                    curr_event = self.scratch.act_event
-                    if self.scratch.act_description in self.scratch.a_mem.embeddings: 
-                        chat_embedding = self.scratch.a_mem.embeddings[
-                                            self.scratch.act_description]
-                    else: 
-                        chat_embedding = get_embedding(self.scratch
-                                                                .act_description)
-                    chat_embedding_pair = (self.scratch.act_description, 
-                                        chat_embedding)
-                    chat_poignancy = self._generate_poig_score("chat", 
-                                                        self.scratch.act_description)
-                    chat_node = self.scratch.a_mem.add_chat(self.scratch.curr_time, None,
-                                curr_event[0], curr_event[1], curr_event[2], 
-                                self.scratch.act_description, keywords, 
-                                chat_poignancy, chat_embedding_pair, 
-                                self.scratch.chat)
-                    chat_node_ids = [chat_node.node_id]
-
-                ret_events += [self.scratch.a_mem.add_event(self.scratch.curr_time, None,
-                                    s, p, o, desc, keywords, event_poignancy, 
-                                    event_embedding_pair, chat_node_ids)]
-                self.scratch.importance_trigger_curr -= event_poignancy
-                self.scratch.importance_ele_n += 1
+                    chat_embedding = get_embedding(self.scratch
+                                                            .act_description)
+                chat_embedding_pair = (self.scratch.act_description, 
+                                    chat_embedding)
+                chat_poignancy = self._generate_poig_score("chat", 
+                                                    self.scratch.act_description)
+                chat_node = self.scratch.a_mem.add_chat(self.scratch.curr_time, None,
+                            curr_event[0], curr_event[1], curr_event[2], 
+                            self.scratch.act_description, keywords, 
+                            chat_poignancy, chat_embedding_pair, 
+                            self.scratch.chat)
+                chat_node_ids = [chat_node.node_id]
+
+            ret_events += [self.scratch.a_mem.add_event(self.scratch.curr_time, None,
+                                s, p, o, desc, keywords, event_poignancy, 
+                                event_embedding_pair, chat_node_ids)]
+            self.scratch.importance_trigger_curr -= event_poignancy
+            self.scratch.importance_ele_n += 1
 
         return ret_events
 
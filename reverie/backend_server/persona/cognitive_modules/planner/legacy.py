@@ -2,6 +2,7 @@ import datetime
 import math
 import random
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List, Tuple, Optional, Union, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -32,6 +33,9 @@ from reverie.backend_server.persona.prompt_template.run_gpt_prompt import (
 from reverie.backend_server.persona.prompt_template.gpt_structure import get_embedding
 from .base import AbstractPlanner
 
+# Worker pool used to overlap LLM calls that do not depend on each other.
+_PREFETCH_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="planner-prefetch")
+
 
 class LegacyPlanner(AbstractPlanner):
     """
@@ -190,14 +194,19 @@ class LegacyPlanner(AbstractPlanner):
         
         act_desp, act_dura = self.scratch.f_daily_schedule[curr_index] 
 
+        # The emoji and event triple only depend on the action description, so
+        # fire them off now and let them run while the address chain resolves.
+        pron_future = _PREFETCH_POOL.submit(self._generate_action_pronunciatio, act_desp)
+        event_future = _PREFETCH_POOL.submit(self._generate_action_event_triple, act_desp)
+
         act_world = maze.access_tile(self.scratch.curr_tile)["world"]
         act_sector = self._generate_action_sector(act_desp, maze)
         act_arena = self._generate_action_arena(act_desp, maze, act_world, act_sector)
         act_address = f"{act_world}:{act_sector}:{act_arena}"
         act_game_object = self._generate_action_game_object(act_desp, act_address, maze)
         new_address = f"{act_world}:{act_sector}:{act_arena}:{act_game_object}"
-        act_pron = self._generate_action_pronunciatio(act_desp)
-        act_event = self._generate_action_event_triple(act_desp)
+        act_pron = pron_future.result()
+        act_event = event_future.result()
         
         act_obj_desp = self._generate_act_obj_desc(act_game_object, act_desp)
         act_obj_pron = self._generate_action_pronunciatio(act_obj_desp)
@@ -22,6 +22,11 @@ if TYPE_CHECKING:
     from persona.cognitive_modules.retriever.base import AbstractRetriever
     from reverie.backend_server.models import AgentContext
 
+# Conversation reflection runs on the step that lands exactly this long
+# before chatting_end_time. Note: seconds, not minutes (the original code
+# spelled it timedelta(0, 10)).
+CHAT_END_LEAD = datetime.timedelta(seconds=10)
+
 
 class LegacyReflector(AbstractReflector):
     """
@@ -83,7 +88,7 @@ class LegacyReflector(AbstractReflector):
 
         # Handle conversation reflection
         if self.scratch.chatting_end_time: 
-            if self.scratch.curr_time + datetime.timedelta(0,10) == self.scratch.chatting_end_time: 
+            if self.scratch.curr_time + CHAT_END_LEAD == self.scratch.chatting_end_time: 
                 convo_thoughts = self._reflect_on_conversation_internal(a_mem)
                 new_thoughts.extend(convo_thoughts)
 
@@ -225,18 +230,22 @@ class LegacyReflector(AbstractReflector):
         retrieved = retriever.retrieve_weighted(focal_points)
 
         # For each of the focal points, generate thoughts and save it in the 
-        # agent's memory. 
-        for focal_pt, nodes in retrieved.items(): 
+        # agent's memory. The insights for all focal points are requested 
+        # together.
+        for nodes in retrieved.values(): 
             xx = [i.embedding_key for i in nodes]
             for xxx in xx: print (xxx)
 
-            thoughts = self._generate_insights_and_evidence(nodes, 5)
-            for thought, evidence in thoughts.items(): 
+        all_thoughts = self._generate_insights_and_evidence_batch(list(retrieved.values()), 5)
+        for thoughts in all_thoughts: 
+            # Score every thought for this focal point in one request.
+            poignancies = run_gpt_prompt_event_poignancy_batch(self.scratch, 
+                                    list(thoughts))[0]
+            for (thought, evidence), thought_poignancy in zip(thoughts.items(), poignancies): 
                 created = self.scratch.curr_time
                 expiration = self.scratch.curr_time + datetime.timedelta(days=30)
                 s, p, o = self._generate_action_event_triple(thought)
                 keywords = set([s, p, o])
-                thought_poignancy = self._generate_poig_score("thought", thought)
                 thought_embedding_pair = (thought, get_embedding(thought))
 
                 new_thought = a_mem.add_thought(created, expiration, s, p, o, 
@@ -265,18 +274,35 @@ class LegacyReflector(AbstractReflector):
     def _generate_insights_and_evidence(self, nodes, n=5): 
         logging.debug("GNS FUNCTION: <generate_insights_and_evidence>")
 
+        statements = self._insight_statements(nodes)
+        ret = run_gpt_prompt_insight_and_guidance(self.scratch, statements, n)[0]
+        return self._map_insight_evidence(ret, nodes)
+
+    def _generate_insights_and_evidence_batch(self, nodes_list, n=5): 
+        """
+        Batched counterpart of _generate_insights_and_evidence: one insight 
+        dict per list of nodes, all generated in a single request.
+        """
+        logging.debug("GNS FUNCTION: <generate_insights_and_evidence_batch>")
+
+        statements_list = [self._insight_statements(nodes) for nodes in nodes_list]
+        rets = run_gpt_prompt_insight_and_guidance_batch(self.scratch, statements_list, n)[0]
+        return [self._map_insight_evidence(ret, nodes) 
+                for ret, nodes in zip(rets, nodes_list)]
+
+    def _insight_statements(self, nodes): 
         statements = ""
         for count, node in enumerate(nodes): 
             statements += f'{str(count)}. {node.embedding_key}\n'
+        return statements
 
-        ret = run_gpt_prompt_insight_and_guidance(self.scratch, statements, n)[0]
-
+    def _map_insight_evidence(self, ret, nodes): 
         print (ret)
         try: 
-            for thought, evi_raw in ret.items(): 
-                evidence_node_id = [nodes[i].node_id for i in evi_raw]
-                ret[thought] = evidence_node_id
-            return ret
+            # ret holds parallel lists of thoughts and evidence indices.
+            thoughts, evidence = ret
+            return {thought: [nodes[i].node_id for i in evi_raw]
+                    for thought, evi_raw in zip(thoughts, evidence)}
         except: 
             return {"this is blank": "node_1"} 
 
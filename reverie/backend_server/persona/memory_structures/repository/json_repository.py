@@ -26,6 +26,39 @@ from reverie.backend_server.models import (
 from reverie.backend_server.global_methods import check_if_file_exists
 from .base import MemoryRepository
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _load_json(path: str) -> Any:
+    """
+    Reads a JSON file, parsing it with orjson when it is installed. The
+    associative memory files hold every embedding as a list of floats, which
+    is where the faster parser pays off. Anything orjson refuses (e.g. NaN)
+    is parsed again with the json module.
+    """
+    if orjson is not None:
+        with open(path, "rb") as f:
+            data = f.read()
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+    with open(path) as f:
+        return json.load(f)
+
+
+def _dump_json(obj: Any, path: str):
+    """Writes obj as compact JSON, through orjson when it is installed."""
+    if orjson is not None:
+        with open(path, "wb") as outfile:
+            outfile.write(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, "w") as outfile:
+        json.dump(obj, outfile)
+
 
 class JsonMemoryRepository(MemoryRepository):
     """
@@ -48,14 +81,12 @@ class JsonMemoryRepository(MemoryRepository):
     def load_spatial_memory(self) -> MemoryTree:
         tree = {}
         if check_if_file_exists(self.spatial_json_path):
-            with open(self.spatial_json_path) as f:
-                tree = json.load(f)
+            tree = _load_json(self.spatial_json_path)
         return MemoryTree(tree)
 
     def save_spatial_memory(self, memory: MemoryTree, save_folder: str):
         out_json = f"{save_folder}/spatial_memory.json"
-        with open(out_json, "w") as outfile:
-            json.dump(memory.tree, outfile)
+        _dump_json(memory.tree, out_json)
 
     # =========================================================================
     # ASSOCIATIVE MEMORY
@@ -71,16 +102,13 @@ class JsonMemoryRepository(MemoryRepository):
         kw_strength_path = f"{self.associative_folder_path}/kw_strength.json"
 
         if check_if_file_exists(nodes_path):
-            with open(nodes_path) as f:
-                nodes = json.load(f)
+            nodes = _load_json(nodes_path)
         
         if check_if_file_exists(embeddings_path):
-            with open(embeddings_path) as f:
-                embeddings = json.load(f)
+            embeddings = _load_json(embeddings_path)
 
         if check_if_file_exists(kw_strength_path):
-            with open(kw_strength_path) as f:
-                kw_strength = json.load(f)
+            kw_strength = _load_json(kw_strength_path)
                 
         return AssociativeMemory(nodes, embeddings, kw_strength)
 
@@ -90,14 +118,9 @@ class JsonMemoryRepository(MemoryRepository):
         
         state = memory.get_state()
         
-        with open(f"{out_folder}/nodes.json", "w") as outfile:
-            json.dump(state["nodes"], outfile)
-            
-        with open(f"{out_folder}/kw_strength.json", "w") as outfile:
-            json.dump(state["kw_strength"], outfile)
-            
-        with open(f"{out_folder}/embeddings.json", "w") as outfile:
-            json.dump(state["embeddings"], outfile)
+        _dump_json(state["nodes"], f"{out_folder}/nodes.json")
+        _dump_json(state["kw_strength"], f"{out_folder}/kw_strength.json")
+        _dump_json(state["embeddings"], f"{out_folder}/embeddings.json")
 
     # =========================================================================
     # SCRATCH (PersonaState)
@@ -112,8 +135,7 @@ class JsonMemoryRepository(MemoryRepository):
         if not check_if_file_exists(self.scratch_json_path):
             return Scratch(None)
         
-        with open(self.scratch_json_path) as f:
-            data = json.load(f)
+        data = _load_json(self.scratch_json_path)
         
         # Convert JSON dict to PersonaState (domain object)
         state = self._dict_to_persona_state(data)
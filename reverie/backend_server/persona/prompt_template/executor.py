@@ -1,19 +1,76 @@
 import json
+import time
 import logging
-from typing import Any, Dict, List, Optional, Union
+import functools
+from typing import Any, Callable, Dict, List, Optional, Union
 
-from reverie.backend_server.infra.llm import LLMService
-from reverie.backend_server.persona.prompt_template.prompts import BasePrompt
+from reverie.backend_server.infra.llm import LLMService, LLMRetryableError, LLMTimeoutError
+from persona.prompt_template.prompts import BasePrompt
+from persona.prompt_template.gpt_structure import generate_prompt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+
+def json_loads(data: Union[str, bytes]) -> Any:
+    """
+    json.loads, going through orjson when it is installed. orjson is stricter
+    than the stdlib parser (e.g. it rejects NaN), so anything it refuses is
+    retried with json before being reported as a decode error.
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+@functools.lru_cache(maxsize=None)
+def _json_instruction(special_instruction: str, example_output: str) -> str:
+    """
+    The JSON enforcement text appended to chat prompts. It only depends on the
+    prompt class, so it is built once per distinct pair and reused.
+    """
+    return (f"Output the response to the prompt above in json. {special_instruction}\n"
+            "Example output json:\n"
+            f'{{"output": "{example_output}"}}')
+
+
+def _parse_response(prompt: BasePrompt, response: Any, prompt_text: str) -> Any:
+    """
+    Validates a response and returns its cleaned up output, raising if it is
+    invalid. The default validate only checks that clean_up succeeds, so for
+    prompts that keep it clean_up is run once and its exception is the
+    validation failure; otherwise the response would be parsed twice.
+    """
+    if getattr(prompt.validate, "__func__", None) is BasePrompt.validate:
+        return prompt.clean_up(response, prompt=prompt_text)
+    if not prompt.validate(response, prompt=prompt_text):
+        raise ValueError(f"Invalid response: {response!r}")
+    return prompt.clean_up(response, prompt=prompt_text)
+
+
 class PromptExecutor:
     """
     Executes prompts using the LLMService, handling prompt generation,
     execution, validation, and cleanup.
+
+    The executor is the only layer that retries: its requests go out with the
+    service's own retries turned off, so a prompt gets at most max_retries + 1
+    requests whether they time out, error or fail validation. If on_timeout
+    is given, it is called as on_timeout(prompt, attempt, timeout) for every
+    attempt that timed out.
     """
-    def __init__(self, llm_service: LLMService):
+    def __init__(self,
+                 llm_service: LLMService,
+                 on_timeout: Optional[Callable[[BasePrompt, int, Optional[float]], None]] = None):
         self.llm_service = llm_service
+        self.on_timeout = on_timeout
 
     def execute(self, 
                 prompt: BasePrompt, 
@@ -82,35 +139,110 @@ class PromptExecutor:
                     **kwargs
                 )
 
+    def execute_batch(self, 
+                      prompts: List[BasePrompt], 
+                      model: str = "gpt-3.5-turbo",
+                      temperature: float = 0.7,
+                      max_tokens: Optional[int] = None,
+                      max_retries: int = 3,
+                      **kwargs) -> List[Any]:
+        """
+        Executes several prompts, returning their outputs in the same order.
+
+        On the completions endpoint all prompts go out in a single request;
+        only the ones whose responses fail validation are re-sent on retry.
+        Chat models take a single prompt per request, so the prompts are
+        executed one by one instead.
+
+        Args:
+            prompts: The prompt instances to execute.
+            model: The LLM model to use.
+            temperature: Sampling temperature.
+            max_tokens: Maximum tokens to generate per prompt.
+            max_retries: Number of retries for validation failures.
+            **kwargs: Additional arguments for the LLM provider.
+
+        Returns:
+            The processed outputs, aligned with prompts.
+        """
+        is_chat_model = ("gpt-3.5" in model or "gpt-4" in model) and "instruct" not in model
+        if is_chat_model or any(p.example_output is not None and p.special_instruction is not None
+                                for p in prompts):
+            return [self.execute(p, model=model, temperature=temperature, max_tokens=max_tokens,
+                                 max_retries=max_retries, **kwargs)
+                    for p in prompts]
+
+        prompt_texts = [self._generate_prompt_text(p) for p in prompts]
+        outputs = [None] * len(prompts)
+        pending = list(range(len(prompts)))
+
+        for i in range(max_retries + 1):
+            if not pending:
+                break
+            try:
+                responses = self.llm_service.completion(
+                    model=model,
+                    prompt=[prompt_texts[j] for j in pending],
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    max_retries=0,
+                    **kwargs
+                )
+            except LLMRetryableError as e:
+                self._retryable_failure([prompts[j] for j in pending], e, i, max_retries,
+                                        kwargs.get("request_timeout"))
+                continue
+            except Exception as e:
+                logger.warning(f"Attempt {i+1} failed: {e}")
+                continue
+
+            if len(responses) != len(pending):
+                logger.warning(f"Attempt {i+1} returned {len(responses)} responses "
+                               f"for {len(pending)} prompts")
+
+            # Prompts without a response stay pending, like invalid ones, so
+            # they are retried or end up with their fail safe.
+            still_pending = pending[len(responses):]
+            for j, response_content in zip(pending, responses):
+                prompt_instance = prompts[j]
+                try:
+                    outputs[j] = _parse_response(prompt_instance, response_content, prompt_texts[j])
+                    continue
+                except Exception as e:
+                    logger.warning(f"Attempt {i+1} failed for prompt {j}: {e}")
+                still_pending.append(j)
+            pending = sorted(still_pending)
+
+        for j in pending:
+            outputs[j] = prompts[j].get_fail_safe()
+        return outputs
+
+    def _retryable_failure(self,
+                           prompts: List[BasePrompt],
+                           error: LLMRetryableError,
+                           attempt: int,
+                           max_retries: int,
+                           timeout: Optional[float]) -> None:
+        """
+        Reports a timed out or rate limited attempt and, unless it was the
+        last one, backs off before the next.
+        """
+        logger.warning(f"Attempt {attempt+1} failed: {error}")
+        if isinstance(error, LLMTimeoutError) and self.on_timeout is not None:
+            for prompt in prompts:
+                self.on_timeout(prompt, attempt + 1, timeout)
+        if attempt < max_retries:
+            time.sleep(self.llm_service.backoff(attempt + 1))
+
     def _generate_prompt_text(self, prompt_instance: BasePrompt, test_input: Any = None) -> str:
         """
         Generates the raw prompt text by filling in the template.
         """
         prompt_input = prompt_instance.create_prompt_input(test_input)
-        
-        # Logic adapted from gpt_structure.generate_prompt
-        if isinstance(prompt_input, str):
-            prompt_input = [prompt_input]
-        prompt_input = [str(i) for i in prompt_input]
-
-        # We assume prompt_template is a file path relative to the project root or current working dir
-        # In the original code, it opens the file directly.
-        # We might need to handle paths better.
-        try:
-            with open(prompt_instance.prompt_template, "r") as f:
-                prompt_text = f.read()
-        except FileNotFoundError:
-            # Try prepending the project root or similar if needed
-            # For now, assume the path is correct as per original code
-            raise
-
-        for count, i in enumerate(prompt_input):   
-            prompt_text = prompt_text.replace(f"!<INPUT {count}>!", i)
-        
-        if "<commentblockmarker>###</commentblockmarker>" in prompt_text: 
-            prompt_text = prompt_text.split("<commentblockmarker>###</commentblockmarker>")[1]
-            
-        return prompt_text.strip()
+        # Template files are read and compiled once, then cached by path.
+        prompt_text = generate_prompt(prompt_input, prompt_instance.prompt_template)
+        prompt_instance.last_prompt = (prompt_input, prompt_text)
+        return prompt_text
 
     def _execute_chat_safe(self, 
                            prompt_text: str, 
@@ -123,10 +255,9 @@ class PromptExecutor:
         
         # Construct the "safe" prompt wrapper (JSON enforcement)
         # This logic mimics ChatGPT_safe_generate_response
-        wrapped_prompt = f'"""\n{prompt_text}\n"""\n'
-        wrapped_prompt += f"Output the response to the prompt above in json. {prompt_instance.special_instruction}\n"
-        wrapped_prompt += "Example output json:\n"
-        wrapped_prompt += f'{{"output": "{str(prompt_instance.example_output)}"}}'
+        instruction = _json_instruction(prompt_instance.special_instruction,
+                                        str(prompt_instance.example_output))
+        wrapped_prompt = f'"""\n{prompt_text}\n"""\n{instruction}'
 
         messages = [{"role": "user", "content": wrapped_prompt}]
 
@@ -137,6 +268,7 @@ class PromptExecutor:
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_tokens,
+                    max_retries=0,
                     **kwargs
                 )
                 
@@ -147,7 +279,7 @@ class PromptExecutor:
                     end_index = response_content.rfind('}') + 1
                     if end_index > 0:
                         response_content = response_content[:end_index]
-                    parsed_json = json.loads(response_content)
+                    parsed_json = json_loads(response_content)
                     output = parsed_json["output"]
                 except (json.JSONDecodeError, KeyError):
                     # If parsing fails, maybe the model just outputted the text?
@@ -156,9 +288,12 @@ class PromptExecutor:
                     # Original code assumes it MUST be JSON.
                     output = response_content
 
-                if prompt_instance.validate(output, prompt=wrapped_prompt):
-                    return prompt_instance.clean_up(output, prompt=wrapped_prompt)
-                
+                return _parse_response(prompt_instance, output, wrapped_prompt)
+
+            except LLMRetryableError as e:
+                self._retryable_failure([prompt_instance], e, i, max_retries,
+                                        kwargs.get("request_timeout"))
+                continue
             except Exception as e:
                 logger.warning(f"Attempt {i+1} failed: {e}")
                 continue
@@ -183,11 +318,15 @@ class PromptExecutor:
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_tokens,
+                    max_retries=0,
                     **kwargs
                 )
                 
-                if prompt_instance.validate(response_content, prompt=prompt_text):
-                    return prompt_instance.clean_up(response_content, prompt=prompt_text)
+                return _parse_response(prompt_instance, response_content, prompt_text)
+            except LLMRetryableError as e:
+                self._retryable_failure([prompt_instance], e, i, max_retries,
+                                        kwargs.get("request_timeout"))
+                continue
             except Exception as e:
                 logger.warning(f"Attempt {i+1} failed: {e}")
                 continue
@@ -224,8 +363,11 @@ class PromptExecutor:
                     # Or raise error.
                     raise NotImplementedError("Completion not supported by this service/provider")
 
-                if prompt_instance.validate(response_content, prompt=prompt_text):
-                    return prompt_instance.clean_up(response_content, prompt=prompt_text)
+                return _parse_response(prompt_instance, response_content, prompt_text)
+            except LLMRetryableError as e:
+                self._retryable_failure([prompt_instance], e, i, max_retries,
+                                        kwargs.get("request_timeout"))
+                continue
             except Exception as e:
                 logger.warning(f"Attempt {i+1} failed: {e}")
                 continue
@@ -4,12 +4,15 @@ Author: Joon Sung Park (joonspk@stanford.edu)
 File: gpt_structure.py
 Description: Wrapper functions for calling OpenAI APIs.
 """
+import os
+import re
 import json
 import random
 import time 
 
 from config import *
-from reverie.backend_server.infra.llm import LLMService, OpenAIProvider
+from reverie.backend_server.infra.llm import (LLMService, OpenAIProvider, 
+                                              LLMRetryableError, LLMTimeoutError)
 
 # Initialize LLM Service
 provider = OpenAIProvider(api_key=OPENAI_API_KEY)
@@ -56,26 +59,33 @@ def GPT4_request(prompt):
     return "ChatGPT ERROR"
 
 
-def ChatGPT_request(prompt): 
+def ChatGPT_request(prompt, timeout=None): 
   """
   Given a prompt and a dictionary of GPT parameters, make a request to OpenAI
   server and returns the response. 
   ARGS:
     prompt: a str prompt
-    gpt_parameter: a python dictionary with the keys indicating the names of  
-                   the parameter and the values indicating the parameter 
-                   values.   
+    timeout: seconds to wait for the response, or None for no limit. A 
+             request with a timeout is sent only once: a timed out or rate 
+             limited request raises LLMRetryableError (LLMTimeoutError for a 
+             timeout) so that the caller's attempt loop decides on retrying. 
   RETURNS: 
     a str of GPT-3's response. 
   """
   # temp_sleep()
+  kwargs = dict()
+  if timeout is not None: 
+    kwargs = {"request_timeout": timeout, "max_retries": 0}
   try: 
     return llm_service.chat_completion(
       model="gpt-3.5-turbo", 
-      messages=[{"role": "user", "content": prompt}]
+      messages=[{"role": "user", "content": prompt}],
+      **kwargs
     )
   
   except Exception as e: 
+    if timeout is not None and isinstance(e, LLMRetryableError): 
+      raise
     print (f"ChatGPT ERROR: {e}")
     return "ChatGPT ERROR"
 
@@ -168,14 +178,30 @@ def ChatGPT_safe_generate_response_OLD(prompt,
                                    fail_safe_response="error",
                                    func_validate=None,
                                    func_clean_up=None,
-                                   verbose=False): 
+                                   verbose=False,
+                                   func_parse=None,
+                                   timeout=None,
+                                   on_timeout=None): 
+  """
+  If func_parse is given, each raw response is parsed exactly once and the
+  parsed object (rather than the raw str) is handed to both func_validate
+  and func_clean_up. 
+
+  If timeout is given, each request waits at most that many seconds and 
+  repeat bounds the total number of requests, whether they time out, error 
+  or fail validation; a timed out or rate limited attempt is followed by a 
+  jittered backoff. on_timeout(attempt) is called for each attempt that 
+  timed out. 
+  """
   if verbose: 
     print ("CHAT GPT PROMPT")
     print (prompt)
 
   for i in range(repeat): 
     try: 
-      curr_gpt_response = ChatGPT_request(prompt).strip()
+      curr_gpt_response = ChatGPT_request(prompt, timeout).strip()
+      if func_parse: 
+        curr_gpt_response = func_parse(curr_gpt_response)
       if func_validate(curr_gpt_response, prompt=prompt): 
         return func_clean_up(curr_gpt_response, prompt=prompt)
       if verbose: 
@@ -183,6 +209,11 @@ def ChatGPT_safe_generate_response_OLD(prompt,
         print (curr_gpt_response)
         print ("~~~~")
 
+    except LLMRetryableError as e: 
+      if on_timeout and isinstance(e, LLMTimeoutError): 
+        on_timeout(i + 1)
+      if i < repeat - 1: 
+        time.sleep(llm_service.backoff(i + 1))
     except: 
       pass
   print ("FAIL SAFE TRIGGERED") 
@@ -226,6 +257,38 @@ def GPT_request(prompt, gpt_parameter):
     return "TOKEN LIMIT EXCEEDED"
 
 
+_INPUT_SLOT_RE = re.compile(r"!<INPUT (\d+)>!")
+_COMMENT_BLOCK_MARKER = "<commentblockmarker>###</commentblockmarker>"
+
+# prompt_lib_file -> (mtime, compiled template)
+_compiled_templates = dict()
+
+
+def _compile_prompt_template(prompt_lib_file): 
+  """
+  Reads a prompt file and splits its body into a list alternating between
+  literal text and input slots: [literal, slot, literal, slot, ..., literal],
+  where each slot is the int index of the !<INPUT n>! placeholder it 
+  replaces. The result is cached per path and re-read only when the file's
+  mtime changes. 
+  """
+  mtime = os.path.getmtime(prompt_lib_file)
+  cached = _compiled_templates.get(prompt_lib_file)
+  if cached and cached[0] == mtime: 
+    return cached[1]
+
+  with open(prompt_lib_file, "r") as f: 
+    prompt = f.read()
+  if _COMMENT_BLOCK_MARKER in prompt: 
+    prompt = prompt.split(_COMMENT_BLOCK_MARKER)[1]
+  parts = _INPUT_SLOT_RE.split(prompt)
+  for i in range(1, len(parts), 2): 
+    parts[i] = int(parts[i])
+
+  _compiled_templates[prompt_lib_file] = (mtime, parts)
+  return parts
+
+
 def generate_prompt(curr_input, prompt_lib_file): 
   """
   Takes in the current input (e.g. comment that you want to classifiy) and 
@@ -244,14 +307,17 @@ def generate_prompt(curr_input, prompt_lib_file):
     curr_input = [curr_input]
   curr_input = [str(i) for i in curr_input]
 
-  f = open(prompt_lib_file, "r")
-  prompt = f.read()
-  f.close()
-  for count, i in enumerate(curr_input):   
-    prompt = prompt.replace(f"!<INPUT {count}>!", i)
-  if "<commentblockmarker>###</commentblockmarker>" in prompt: 
-    prompt = prompt.split("<commentblockmarker>###</commentblockmarker>")[1]
-  return prompt.strip()
+  parts = _compile_prompt_template(prompt_lib_file)
+  out = []
+  for count, part in enumerate(parts): 
+    if count % 2 == 0: 
+      out.append(part)
+    elif part < len(curr_input): 
+      out.append(curr_input[part])
+    else: 
+      # No input for this slot; leave the placeholder as is. 
+      out.append(f"!<INPUT {part}>!")
+  return "".join(out).strip()
 
 
 def safe_generate_response(prompt, 
@@ -7,10 +7,18 @@ Description: For printing prompts when the setting for verbose is set to True.
 import sys
 sys.path.append('../')
 
+import os
 import json
-import numpy
+import atexit
 import datetime
 import random
+import threading
+from types import MappingProxyType
+
+try: 
+  import orjson
+except ImportError: 
+  orjson = None
 
 from persona.prompt_template.gpt_structure import *
 from config import *
@@ -38,3 +46,115 @@ def print_run_prompts(prompt_template=None,
   print (output, "\n") 
   print ("=== END ==========================================================")
   print ("\n\n\n")
+
+
+class PromptLogger: 
+  """
+  Process-wide append-only JSONL writer for prompt/response records. 
+
+  The log file is opened once (lazily, on the first record) and kept open 
+  behind a buffered writer, instead of being reopened per prompt. The buffer 
+  is flushed every flush_every records and when the interpreter exits. 
+  """
+  _instance = None
+  _lock = threading.Lock()
+
+  def __new__(cls, path=PROMPT_LOG_PATH, flush_every=50): 
+    if cls._instance is None: 
+      with cls._lock: 
+        if cls._instance is None: 
+          cls._instance = super(PromptLogger, cls).__new__(cls)
+          cls._instance._initialized = False
+    return cls._instance
+
+  def __init__(self, path=PROMPT_LOG_PATH, flush_every=50): 
+    if self._initialized: 
+      return
+    self.path = path
+    self.flush_every = flush_every
+    self._file = None
+    self._pending = 0
+    self._initialized = True
+    atexit.register(self.close)
+
+  @staticmethod
+  def _default(obj): 
+    # Frozen fail-safe responses are logged as plain dicts.
+    if isinstance(obj, MappingProxyType): 
+      return dict(obj)
+    # orjson refuses tuple subclasses (e.g. EventTriple) that json writes 
+    # as arrays.
+    if isinstance(obj, tuple): 
+      return list(obj)
+    return str(obj)
+
+  def _dumps(self, record): 
+    if orjson is not None: 
+      return orjson.dumps(record, default=self._default, 
+                          option=orjson.OPT_NON_STR_KEYS) + b"\n"
+    return (json.dumps(record, default=self._default) + "\n").encode("utf-8")
+
+  def log(self, record): 
+    line = self._dumps(record)
+    with self._lock: 
+      if self._file is None: 
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._file = open(self.path, "ab")
+      self._file.write(line)
+      self._pending += 1
+      if self._pending >= self.flush_every: 
+        self._file.flush()
+        self._pending = 0
+
+  def flush(self): 
+    with self._lock: 
+      if self._file is not None: 
+        self._file.flush()
+        self._pending = 0
+
+  def close(self): 
+    with self._lock: 
+      if self._file is not None: 
+        self._file.close()
+        self._file = None
+        self._pending = 0
+
+
+def log_run_prompts(prompt_template=None, 
+                    persona=None, 
+                    gpt_param=None, 
+                    prompt_input=None,
+                    prompt=None, 
+                    output=None): 
+  """
+  Same information as print_run_prompts, appended as one JSONL record to 
+  the prompt log instead of being printed. 
+  """
+  PromptLogger().log({
+    "time": datetime.datetime.now().isoformat(),
+    "prompt_template": prompt_template,
+    "persona": getattr(persona, "name", None),
+    "gpt_param": dict(gpt_param) if gpt_param is not None else None,
+    "prompt_input": prompt_input,
+    "prompt": prompt,
+    "output": output,
+  })
+
+
+def log_prompt_timeout(prompt_template=None, 
+                       persona=None, 
+                       timeout=None, 
+                       attempt=None): 
+  """
+  Appends one JSONL record to the prompt log for a request that got no 
+  response within its timeout, so that per-prompt timeouts can be tuned 
+  from the log. 
+  """
+  PromptLogger().log({
+    "time": datetime.datetime.now().isoformat(),
+    "event": "timeout",
+    "prompt_template": prompt_template,
+    "persona": getattr(persona, "name", None),
+    "timeout": timeout,
+    "attempt": attempt,
+  })
@@ -1,9 +1,32 @@
+import re
+import ast
 import sys
 import random
 import string
 import datetime
 from persona.prompt_template.gpt_structure import *
 from persona.prompt_template.print_prompt import *
+from reverie.backend_server.models import EventTriple
+
+_QUOTED_RE = re.compile(r'"([^"]*)"')
+_DIGITS_RE = re.compile(r'\d+')
+_ALPHANUM = string.ascii_letters + string.digits
+
+def _parse_poignancy(value): 
+  """
+  Parses a single poignancy rating. The chat JSON path may hand over either 
+  "5" or 5, so both are accepted; anything outside the 1 to 10 scale the 
+  prompts ask for is rejected so that the request is retried. An exact int 
+  is taken as is, while bools and floats go through the string path and are 
+  rejected there. 
+  """
+  if type(value) is int: 
+    rating = value
+  else: 
+    rating = int(str(value).strip())
+  if not 1 <= rating <= 10: 
+    raise ValueError(f"Poignancy {rating} is outside the 1 to 10 scale")
+  return rating
 
 def get_random_alphanumeric(i=6, j=6): 
   """
@@ -16,9 +39,7 @@ def get_random_alphanumeric(i=6, j=6):
   OUTPUT: 
     an alpha numeric str with the length of somewhere between i and j.
   """
-  k = random.randint(i, j)
-  x = ''.join(random.choices(string.ascii_letters + string.digits, k=k))
-  return x
+  return ''.join(random.choices(_ALPHANUM, k=random.randint(i, j)))
 
 class BasePrompt:
   """
@@ -34,6 +55,12 @@ class BasePrompt:
     self.prompt_template = ""
     self.example_output = None
     self.special_instruction = None
+    # (prompt_input, prompt_text) of the last request the executor built, so 
+    # callers can report what was sent without assembling it again.
+    self.last_prompt = None
+    # Seconds to wait on a single request before abandoning and retrying it. 
+    # None derives it from the request's max_tokens (see get_timeout).
+    self.timeout = None
 
   def create_prompt_input(self, test_input=None):
     """
@@ -42,6 +69,19 @@ class BasePrompt:
     """
     raise NotImplementedError
 
+  def get_timeout(self, max_tokens=None):
+    """
+    Returns the per-request timeout in seconds. Unless the subclass sets 
+    one, it scales with the number of tokens the request may generate, so 
+    short answers (poignancy, pronunciatio) give up quickly on a stalled 
+    request while long generations get more room.
+    """
+    if self.timeout is not None: 
+      return self.timeout
+    if max_tokens is None: 
+      return 30
+    return max_tokens * 0.1 + 3
+
   def get_fail_safe(self):
     """
     Returns the fail-safe response in case of GPT failure.
@@ -259,33 +299,40 @@ class TaskDecompPrompt(BasePrompt):
     total_expected_min = int(prompt.split("(total duration in minutes")[-1]
                                    .split("):")[0].strip())
     
-    curr_min_slot = [["dummy", -1],] 
-    for count, i in enumerate(cr): 
-      i_task = i[0] 
-      i_duration = i[1]
-
-      i_duration -= (i_duration % 5)
-      if i_duration > 0: 
-        for j in range(i_duration): 
-          curr_min_slot += [(i_task, count)]       
-    curr_min_slot = curr_min_slot[1:]   
-
-    if len(curr_min_slot) > total_expected_min: 
-      last_task = curr_min_slot[60]
-      for i in range(1, 6): 
-        curr_min_slot[-1 * i] = last_task
-    elif len(curr_min_slot) < total_expected_min: 
-      last_task = curr_min_slot[-1]
-      for i in range(total_expected_min - len(curr_min_slot)):
-        curr_min_slot += [last_task]
-
-    cr_ret = [["dummy", -1],]
-    for task, task_index in curr_min_slot: 
-      if task != cr_ret[-1][0]: 
-        cr_ret += [[task, 1]]
+    # Durations are rounded down to 5 minutes and then stretched (or 
+    # patched) to fill the expected total. This works on (task, minutes) 
+    # runs directly rather than spelling the schedule out minute by minute. 
+    runs = [[i_task, i_duration - (i_duration % 5)] for i_task, i_duration in cr
+            if i_duration - (i_duration % 5) > 0]
+    total_min = sum(i_duration for _, i_duration in runs)
+
+    if total_min > total_expected_min: 
+      # The last five minutes are handed to the task running at minute 60. 
+      if total_min <= 60: 
+        raise IndexError("schedule is too short to patch")
+      elapsed = 0
+      for i_task, i_duration in runs: 
+        elapsed += i_duration
+        if elapsed > 60: 
+          last_task = i_task
+          break
+      trim = 5
+      while trim: 
+        cut = min(trim, runs[-1][1])
+        runs[-1][1] -= cut
+        trim -= cut
+        if not runs[-1][1]: 
+          runs.pop()
+      runs += [[last_task, 5]]
+    elif total_min < total_expected_min: 
+      runs[-1][1] += total_expected_min - total_min
+
+    cr = []
+    for i_task, i_duration in runs: 
+      if cr and cr[-1][0] == i_task: 
+        cr[-1][1] += i_duration
       else: 
-        cr_ret[-1][1] += 1
-    cr = cr_ret[1:]
+        cr += [[i_task, i_duration]]
 
     output = cr
     fin_output = []
@@ -502,7 +549,7 @@ class PronunciatioPrompt(BasePrompt):
 
   def validate(self, llm_response, prompt=""):
     try: 
-      self.clean_up(llm_response, prompt="")
+      self.clean_up(llm_response, prompt)
       if len(llm_response) == 0: 
         return False
     except: return False
@@ -529,18 +576,18 @@ class EventTriplePrompt(BasePrompt):
   def clean_up(self, llm_response, prompt=""):
     cr = llm_response.strip()
     cr = [i.strip() for i in cr.split(")")[0].split(",")]
-    return (self.persona.name, cr[0], cr[1])
+    return EventTriple(self.persona.name, cr[0], cr[1])
 
   def validate(self, llm_response, prompt=""):
     try: 
-      llm_response = self.clean_up(llm_response, prompt="")
+      llm_response = self.clean_up(llm_response, prompt)
       if len(llm_response) != 2: 
         return False
     except: return False
     return True 
 
   def get_fail_safe(self):
-    return (self.persona.name, "is", "idle")
+    return EventTriple(self.persona.name, "is", "idle")
 
 class ActObjDescPrompt(BasePrompt):
   def __init__(self, persona, act_game_object, act_desp, verbose=False):
@@ -566,7 +613,7 @@ class ActObjDescPrompt(BasePrompt):
 
   def validate(self, llm_response, prompt=""):
     try: 
-      self.clean_up(llm_response, prompt="")
+      self.clean_up(llm_response, prompt)
     except: 
       return False
     return True 
@@ -590,18 +637,18 @@ class ActObjEventTriplePrompt(BasePrompt):
   def clean_up(self, llm_response, prompt=""):
     cr = llm_response.strip()
     cr = [i.strip() for i in cr.split(")")[0].split(",")]
-    return (self.act_game_object, cr[0], cr[1])
+    return EventTriple(self.act_game_object, cr[0], cr[1])
 
   def validate(self, llm_response, prompt=""):
     try: 
-      llm_response = self.clean_up(llm_response, prompt="")
+      llm_response = self.clean_up(llm_response, prompt)
       if len(llm_response) != 2: 
         return False
     except: return False
     return True 
 
   def get_fail_safe(self):
-    return (self.act_game_object, "is", "idle")
+    return EventTriple(self.act_game_object, "is", "idle")
 
 class NewDecompSchedulePrompt(BasePrompt):
   def __init__(self, persona, main_act_dur, truncated_act_dur, start_time_hour, end_time_hour, inserted_act, inserted_act_dur, verbose=False):
@@ -878,6 +925,7 @@ class CreateConversationPrompt(BasePrompt):
     self.target_persona = target_persona
     self.curr_loc = curr_loc
     self.prompt_template = "persona/prompt_template/v2/create_conversation_v2.txt"
+    self.timeout = 30
 
   def create_prompt_input(self, test_input=None):
     prev_convo_insert = "\n"
@@ -908,7 +956,7 @@ class CreateConversationPrompt(BasePrompt):
 
   def clean_up(self, llm_response, prompt=""):
     llm_response = (prompt + llm_response).split("Here is their conversation.")[-1].strip()
-    content = re.findall('"([^"]*)"', llm_response)
+    content = _QUOTED_RE.findall(llm_response)
 
     speaker_order = []
     for i in llm_response.split("\n"): 
@@ -987,7 +1035,9 @@ class ExtractKeywordsPrompt(BasePrompt):
         if i[-1] == ".": 
           i = i[:-1]
         ret += [i]
-    return set(ret)
+    # Order-preserving dedup; the response is seldom repetitive enough to 
+    # be worth hashing into a set.
+    return list(dict.fromkeys(ret))
 
   def validate(self, llm_response, prompt=""):
     try: 
@@ -1055,40 +1105,22 @@ class ConvoToThoughtsPrompt(BasePrompt):
   def get_fail_safe(self):
     return ""
 
-class EventPoignancyPrompt(BasePrompt):
-  def __init__(self, persona, event_description, verbose=False):
-    super().__init__(persona, verbose)
-    self.event_description = event_description
-    self.prompt_template = "persona/prompt_template/v3_ChatGPT/poignancy_event_v1.txt"
-    self.example_output = "5"
-    self.special_instruction = "The output should ONLY contain ONE integer value on the scale of 1 to 10."
-
-  def create_prompt_input(self, test_input=None):
-    prompt_input = [self.persona.scratch.name,
-                    self.persona.scratch.get_str_iss(),
-                    self.persona.scratch.name,
-                    self.event_description]
-    return prompt_input
-
-  def clean_up(self, llm_response, prompt=""):
-    llm_response = int(llm_response.strip())
-    return llm_response
-
-  def validate(self, llm_response, prompt=""):
-    try: 
-      self.clean_up(llm_response, prompt)
-      return True
-    except:
-      return False 
-
-  def get_fail_safe(self):
-    return 4
+class PoignancyPrompt(BasePrompt):
+  """
+  Rates how poignant an event, a thought or a chat is to the persona on a 
+  1 to 10 scale. The three kinds differ only in their template. 
+  """
+  TEMPLATES = {
+    "event": "persona/prompt_template/v3_ChatGPT/poignancy_event_v1.txt",
+    "thought": "persona/prompt_template/v3_ChatGPT/poignancy_thought_v1.txt",
+    "chat": "persona/prompt_template/v3_ChatGPT/poignancy_chat_v1.txt",
+  }
 
-class ThoughtPoignancyPrompt(BasePrompt):
-  def __init__(self, persona, event_description, verbose=False):
+  def __init__(self, persona, description, kind="event", verbose=False):
     super().__init__(persona, verbose)
-    self.event_description = event_description
-    self.prompt_template = "persona/prompt_template/v3_ChatGPT/poignancy_thought_v1.txt"
+    self.description = description
+    self.kind = kind
+    self.prompt_template = self.TEMPLATES[kind]
     self.example_output = "5"
     self.special_instruction = "The output should ONLY contain ONE integer value on the scale of 1 to 10."
 
@@ -1096,12 +1128,11 @@ class ThoughtPoignancyPrompt(BasePrompt):
     prompt_input = [self.persona.scratch.name,
                     self.persona.scratch.get_str_iss(),
                     self.persona.scratch.name,
-                    self.event_description]
+                    self.description]
     return prompt_input
 
   def clean_up(self, llm_response, prompt=""):
-    llm_response = int(llm_response.strip())
-    return llm_response
+    return _parse_poignancy(llm_response)
 
   def validate(self, llm_response, prompt=""):
     try: 
@@ -1113,24 +1144,38 @@ class ThoughtPoignancyPrompt(BasePrompt):
   def get_fail_safe(self):
     return 4
 
-class ChatPoignancyPrompt(BasePrompt):
-  def __init__(self, persona, event_description, verbose=False):
+class EventPoignancyBatchPrompt(BasePrompt):
+  """
+  Rates a list of events in a single request instead of one request per 
+  event. The response is a list of integers aligned with event_descriptions.
+  """
+  def __init__(self, persona, event_descriptions, verbose=False):
     super().__init__(persona, verbose)
-    self.event_description = event_description
-    self.prompt_template = "persona/prompt_template/v3_ChatGPT/poignancy_chat_v1.txt"
-    self.example_output = "5"
-    self.special_instruction = "The output should ONLY contain ONE integer value on the scale of 1 to 10."
+    self.event_descriptions = event_descriptions
+    self.prompt_template = "persona/prompt_template/v3_ChatGPT/poignancy_event_batch_v1.txt"
+    self.example_output = "[5, 2, 8]"
+    self.special_instruction = (f"The output should ONLY contain a list of "
+                                f"{len(event_descriptions)} integer values on "
+                                f"the scale of 1 to 10.")
 
   def create_prompt_input(self, test_input=None):
+    events = ""
+    for count, i in enumerate(self.event_descriptions): 
+      events += f"{count+1}. {i}\n"
     prompt_input = [self.persona.scratch.name,
                     self.persona.scratch.get_str_iss(),
                     self.persona.scratch.name,
-                    self.event_description]
+                    events,
+                    str(len(self.event_descriptions))]
     return prompt_input
 
   def clean_up(self, llm_response, prompt=""):
-    llm_response = int(llm_response.strip())
-    return llm_response
+    if isinstance(llm_response, str): 
+      llm_response = ast.literal_eval(llm_response.strip())
+    cr = [_parse_poignancy(i) for i in llm_response]
+    if len(cr) != len(self.event_descriptions): 
+      raise ValueError(f"Expected {len(self.event_descriptions)} scores, got {len(cr)}")
+    return cr
 
   def validate(self, llm_response, prompt=""):
     try: 
@@ -1140,7 +1185,7 @@ class ChatPoignancyPrompt(BasePrompt):
       return False 
 
   def get_fail_safe(self):
-    return 4
+    return [4] * len(self.event_descriptions)
 
 class FocalPtPrompt(BasePrompt):
   def __init__(self, persona, statements, n, verbose=False):
@@ -1181,16 +1226,19 @@ class InsightAndGuidancePrompt(BasePrompt):
     return prompt_input
 
   def clean_up(self, llm_response, prompt=""):
+    # Returns two parallel lists: thoughts[i] is backed by the statement 
+    # indices in evidence[i]. 
     llm_response = "1. " + llm_response.strip()
-    ret = dict()
+    thoughts = []
+    evidence = []
     for i in llm_response.split("\n"): 
       row = i.split(". ")[-1]
       thought = row.split("(because of ")[0].strip()
       evi_raw = row.split("(because of ")[1].split(")")[0].strip()
-      evi_raw = re.findall(r'\d+', evi_raw)
-      evi_raw = [int(i.strip()) for i in evi_raw]
-      ret[thought] = evi_raw
-    return ret
+      evi_raw = _DIGITS_RE.findall(evi_raw)
+      thoughts += [thought]
+      evidence += [[int(i.strip()) for i in evi_raw]]
+    return thoughts, evidence
 
   def validate(self, llm_response, prompt=""):
     try: 
@@ -1308,7 +1356,7 @@ class AgentChatPrompt(BasePrompt):
 
   def clean_up(self, llm_response, prompt=""):
     llm_response = (prompt + llm_response).split("Here is their conversation.")[-1].strip()
-    content = re.findall('"([^"]*)"', llm_response)
+    content = _QUOTED_RE.findall(llm_response)
 
     speaker_order = []
     for i in llm_response.split("\n"): 
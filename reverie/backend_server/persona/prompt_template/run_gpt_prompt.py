@@ -5,13 +5,10 @@ File: run_gpt_prompt.py
 Description: Defines all run gpt prompt functions. These functions directly
 interface with the safe_generate_response function.
 """
-import re
-import datetime
 import sys
-import ast
-import random
-import string
 import json
+import logging
+from types import MappingProxyType
 
 sys.path.append('../../')
 
@@ -22,8 +19,10 @@ from persona.prompt_template.gpt_structure import (
     ChatGPT_single_request,
     DEBUG
 )
-from persona.prompt_template.print_prompt import print_run_prompts
+from persona.prompt_template.print_prompt import (print_run_prompts, log_run_prompts, 
+                                                  log_prompt_timeout)
 from persona.prompt_template.prompts import (
+    get_random_alphanumeric,
     WakeUpHourPrompt,
     DailyPlanPrompt,
     HourlySchedulePrompt,
@@ -43,9 +42,8 @@ from persona.prompt_template.prompts import (
     ExtractKeywordsPrompt,
     KeywordToThoughtsPrompt,
     ConvoToThoughtsPrompt,
-    EventPoignancyPrompt,
-    ThoughtPoignancyPrompt,
-    ChatPoignancyPrompt,
+    PoignancyPrompt,
+    EventPoignancyBatchPrompt,
     FocalPtPrompt,
     InsightAndGuidancePrompt,
     AgentChatSummarizeIdeasPrompt,
@@ -57,27 +55,29 @@ from persona.prompt_template.prompts import (
     PlanningThoughtOnConvoPrompt,
     MemoOnConvoPrompt
 )
-from persona.prompt_template.executor import PromptExecutor
+from persona.prompt_template.executor import PromptExecutor, json_loads
 
-# Initialize the executor with the service from gpt_structure
-prompt_executor = PromptExecutor(llm_service)
+logger = logging.getLogger(__name__)
 
-def get_random_alphanumeric(i=6, j=6): 
-  """
-  Returns a random alpha numeric strength that has the length of somewhere
-  between i and j. 
+# Requests per prompt, counting timed out, failed and invalid ones alike. 
+_MAX_ATTEMPTS = 3
 
-  INPUT: 
-    i: min_range for the length
-    j: max_range for the length
-  OUTPUT: 
-    an alpha numeric str with the length of somewhere between i and j.
-  """
-  k = random.randint(i, j)
-  x = ''.join(random.choices(string.ascii_letters + string.digits, k=k))
-  return x
+# The conversation prompts below are not Prompt classes, so their request 
+# timeouts are set here rather than through BasePrompt.get_timeout. 
+_SAFETY_SCORE_TIMEOUT = 8
+_ITERATIVE_CHAT_UTT_TIMEOUT = 30
 
-def safe_execute_prompt(prompt_instance, gpt_param, test_input=None):
+def _log_timeout(prompt_template, persona, timeout, attempt): 
+  if DEBUG: 
+    log_prompt_timeout(prompt_template, persona, timeout, attempt)
+
+def _log_prompt_timeout(prompt_instance, attempt, timeout): 
+  _log_timeout(prompt_instance.prompt_template, prompt_instance.persona, timeout, attempt)
+
+# Initialize the executor with the service from gpt_structure
+prompt_executor = PromptExecutor(llm_service, on_timeout=_log_prompt_timeout)
+
+def _executor_params(gpt_param): 
   # Map legacy parameters
   model = gpt_param.get("engine", "gpt-3.5-turbo-instruct")
   if model == "text-davinci-003":
@@ -89,6 +89,22 @@ def safe_execute_prompt(prompt_instance, gpt_param, test_input=None):
   
   # Filter out keys that are not for the LLM call or need mapping
   kwargs = {k: v for k, v in gpt_param.items() if k not in ["engine", "temperature", "max_tokens"]}
+  return model, temperature, max_tokens, kwargs
+
+def _sent_prompt(prompt_instance, test_input=None): 
+  """
+  Returns the (prompt_input, prompt_text) pair the executor built for the 
+  request, for the debug info. It is only assembled again if the executor 
+  did not record it. 
+  """
+  if prompt_instance.last_prompt is not None: 
+    return prompt_instance.last_prompt
+  prompt_input = prompt_instance.create_prompt_input(test_input)
+  return prompt_input, generate_prompt(prompt_input, prompt_instance.prompt_template)
+
+def safe_execute_prompt(prompt_instance, gpt_param, test_input=None):
+  model, temperature, max_tokens, kwargs = _executor_params(gpt_param)
+  kwargs.setdefault("request_timeout", prompt_instance.get_timeout(max_tokens))
 
   output = prompt_executor.execute(
       prompt_instance,
@@ -96,20 +112,59 @@ def safe_execute_prompt(prompt_instance, gpt_param, test_input=None):
       model=model,
       temperature=temperature,
       max_tokens=max_tokens,
+      max_retries=_MAX_ATTEMPTS - 1,
       **kwargs
   )
   
-  # Reconstruct debug info
-  prompt_input = prompt_instance.create_prompt_input(test_input)
-  prompt_text = prompt_executor._generate_prompt_text(prompt_instance, test_input)
+  prompt_input, prompt_text = _sent_prompt(prompt_instance, test_input)
   fail_safe = prompt_instance.get_fail_safe()
   
-  if DEBUG or prompt_instance.verbose: 
+  if prompt_instance.verbose: 
     print_run_prompts(prompt_instance.prompt_template, prompt_instance.persona, gpt_param, 
                       prompt_input, prompt_text, output)
+  if DEBUG: 
+    log_run_prompts(prompt_instance.prompt_template, prompt_instance.persona, gpt_param, 
+                    prompt_input, prompt_text, output)
     
   return output, [output, prompt_text, gpt_param, prompt_input, fail_safe]
 
+def safe_execute_prompts(prompt_instances, gpt_param):
+  """
+  Batched counterpart of safe_execute_prompt for instances of one Prompt 
+  class that differ only in their inputs. On the completions endpoint they 
+  are sent as one request (see PromptExecutor.execute_batch). 
+
+  OUTPUT: 
+    the list of outputs and the matching list of debug info lists, both 
+    aligned with prompt_instances.
+  """
+  model, temperature, max_tokens, kwargs = _executor_params(gpt_param)
+  if prompt_instances: 
+    # One request carries every prompt, so it gets the longest timeout.
+    kwargs.setdefault("request_timeout", 
+                      max(p.get_timeout(max_tokens) for p in prompt_instances))
+
+  outputs = prompt_executor.execute_batch(
+      prompt_instances,
+      model=model,
+      temperature=temperature,
+      max_tokens=max_tokens,
+      max_retries=_MAX_ATTEMPTS - 1,
+      **kwargs
+  )
+
+  details = []
+  for prompt_instance, output in zip(prompt_instances, outputs): 
+    prompt_input, prompt_text = _sent_prompt(prompt_instance)
+    if prompt_instance.verbose: 
+      print_run_prompts(prompt_instance.prompt_template, prompt_instance.persona, gpt_param, 
+                        prompt_input, prompt_text, output)
+    if DEBUG: 
+      log_run_prompts(prompt_instance.prompt_template, prompt_instance.persona, gpt_param, 
+                      prompt_input, prompt_text, output)
+    details += [[output, prompt_text, gpt_param, prompt_input, prompt_instance.get_fail_safe()]]
+  return outputs, details
+
 def get_gpt_param(override_params=None):
   gpt_param = {"engine": "gpt-3.5-turbo-instruct", "max_tokens": 50, 
                "temperature": 0.0, "top_p": 1, "stream": False,
@@ -120,6 +175,48 @@ def get_gpt_param(override_params=None):
   return gpt_param
 
 
+# Per-wrapper GPT parameters, built once at import time instead of on every
+# call. Wrapped in MappingProxyType since the same mapping is shared by every
+# call (and returned in the debug info).
+_GPT_PARAMS = {
+  "wake_up_hour":                      MappingProxyType(get_gpt_param({"max_tokens": 5, "temperature": 0.8})),
+  "daily_plan":                        MappingProxyType(get_gpt_param({"max_tokens": 500, "temperature": 1, "stop": None})),
+  "generate_hourly_schedule":          MappingProxyType(get_gpt_param({"max_tokens": 50, "temperature": 0.5, "stop": ["\n"]})),
+  "task_decomp":                       MappingProxyType(get_gpt_param({"max_tokens": 1000, "stop": None})),
+  "action_sector":                     MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "action_arena":                      MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "action_game_object":                MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "pronunciatio":                      MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "event_triple":                      MappingProxyType(get_gpt_param({"max_tokens": 30, "stop": ["\n"]})),
+  "act_obj_desc":                      MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "act_obj_event_triple":              MappingProxyType(get_gpt_param({"max_tokens": 30, "stop": ["\n"]})),
+  "new_decomp_schedule":               MappingProxyType(get_gpt_param({"max_tokens": 1000, "stop": None})),
+  "decide_to_talk":                    MappingProxyType(get_gpt_param({"max_tokens": 20, "stop": None})),
+  "decide_to_react":                   MappingProxyType(get_gpt_param({"max_tokens": 20, "stop": None})),
+  "create_conversation":               MappingProxyType(get_gpt_param({"max_tokens": 1000, "temperature": 0.7, "stop": None})),
+  "summarize_conversation":            MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "extract_keywords":                  MappingProxyType(get_gpt_param({"max_tokens": 50, "stop": None})),
+  "keyword_to_thoughts":               MappingProxyType(get_gpt_param({"max_tokens": 40, "temperature": 0.7, "stop": None})),
+  "convo_to_thoughts":                 MappingProxyType(get_gpt_param({"max_tokens": 40, "temperature": 0.7, "stop": None})),
+  "event_poignancy":                   MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "event_poignancy_batch":             MappingProxyType(get_gpt_param({"max_tokens": 150, "stop": None})),
+  "thought_poignancy":                 MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "chat_poignancy":                    MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "focal_pt":                          MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "insight_and_guidance":              MappingProxyType(get_gpt_param({"max_tokens": 150, "temperature": 0.5, "stop": None})),
+  "agent_chat_summarize_ideas":        MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "agent_chat_summarize_relationship": MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "agent_chat":                        MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "summarize_ideas":                   MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "generate_next_convo_line":          MappingProxyType(get_gpt_param({"max_tokens": 250, "temperature": 1, "stop": None})),
+  "generate_whisper_inner_thought":    MappingProxyType(get_gpt_param({"max_tokens": 50, "stop": None})),
+  "planning_thought_on_convo":         MappingProxyType(get_gpt_param({"max_tokens": 50, "stop": None})),
+  "memo_on_convo":                     MappingProxyType(get_gpt_param({"max_tokens": 15, "stop": None})),
+  "safety_score":                      MappingProxyType(get_gpt_param({"stop": None})),
+  "iterative_chat_utt":                MappingProxyType(get_gpt_param({"stop": None})),
+}
+
+
 ##############################################################################
 # CHAPTER 1: Run GPT Prompt
 ##############################################################################
@@ -134,7 +231,7 @@ def run_gpt_prompt_wake_up_hour(persona, test_input=None, verbose=False):
   OUTPUT: 
     integer for the wake up hour.
   """
-  gpt_param = get_gpt_param({"max_tokens": 5, "temperature": 0.8})
+  gpt_param = _GPT_PARAMS["wake_up_hour"]
   prompt = WakeUpHourPrompt(persona, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -155,7 +252,7 @@ def run_gpt_prompt_daily_plan(persona,
   OUTPUT: 
     a list of daily actions in broad strokes.
   """
-  gpt_param = get_gpt_param({"max_tokens": 500, "temperature": 1, "stop": None})
+  gpt_param = _GPT_PARAMS["daily_plan"]
   prompt = DailyPlanPrompt(persona, wake_up_hour, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -167,7 +264,7 @@ def run_gpt_prompt_generate_hourly_schedule(persona,
                                             intermission2=None,
                                             test_input=None, 
                                             verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 50, "temperature": 0.5, "stop": ["\n"]})
+  gpt_param = _GPT_PARAMS["generate_hourly_schedule"]
   prompt = HourlySchedulePrompt(persona, curr_hour_str, p_f_ds_hourly_org, hour_str, intermission2, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -177,7 +274,7 @@ def run_gpt_prompt_task_decomp(persona,
                                duration, 
                                test_input=None, 
                                verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 1000, "stop": None})
+  gpt_param = _GPT_PARAMS["task_decomp"]
   prompt = TaskDecompPrompt(persona, task, duration, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -187,7 +284,7 @@ def run_gpt_prompt_action_sector(action_description,
                                 maze, 
                                 test_input=None, 
                                 verbose=False):
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["action_sector"]
   prompt = ActionSectorPrompt(persona, maze, action_description, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -197,7 +294,7 @@ def run_gpt_prompt_action_arena(action_description,
                                 maze, act_world, act_sector,
                                 test_input=None, 
                                 verbose=False):
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["action_arena"]
   prompt = ActionArenaPrompt(persona, maze, act_world, act_sector, action_description, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -208,31 +305,31 @@ def run_gpt_prompt_action_game_object(action_description,
                                       temp_address,
                                       test_input=None, 
                                       verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["action_game_object"]
   prompt = ActionGameObjectPrompt(persona, maze, temp_address, action_description, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_pronunciatio(action_description, persona, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["pronunciatio"]
   prompt = PronunciatioPrompt(persona, action_description, verbose)
   return safe_execute_prompt(prompt, gpt_param)
 
 
 def run_gpt_prompt_event_triple(action_description, persona, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 30, "stop": ["\n"]})
+  gpt_param = _GPT_PARAMS["event_triple"]
   prompt = EventTriplePrompt(persona, action_description, verbose)
   return safe_execute_prompt(prompt, gpt_param)
 
 
 def run_gpt_prompt_act_obj_desc(act_game_object, act_desp, persona, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["act_obj_desc"]
   prompt = ActObjDescPrompt(persona, act_game_object, act_desp, verbose)
   return safe_execute_prompt(prompt, gpt_param)
 
 
 def run_gpt_prompt_act_obj_event_triple(act_game_object, act_obj_desc, persona, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 30, "stop": ["\n"]})
+  gpt_param = _GPT_PARAMS["act_obj_event_triple"]
   prompt = ActObjEventTriplePrompt(persona, act_game_object, act_obj_desc, verbose)
   return safe_execute_prompt(prompt, gpt_param)
 
@@ -246,46 +343,46 @@ def run_gpt_prompt_new_decomp_schedule(persona,
                                        inserted_act_dur,
                                        test_input=None, 
                                        verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 1000, "stop": None})
+  gpt_param = _GPT_PARAMS["new_decomp_schedule"]
   prompt = NewDecompSchedulePrompt(persona, main_act_dur, truncated_act_dur, start_time_hour, end_time_hour, inserted_act, inserted_act_dur, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_decide_to_talk(persona, target_persona, retrieved,test_input=None, 
                                        verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 20, "stop": None})
+  gpt_param = _GPT_PARAMS["decide_to_talk"]
   prompt = DecideToTalkPrompt(persona, target_persona, retrieved, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_decide_to_react(persona, target_persona, retrieved,test_input=None, 
                                        verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 20, "stop": None})
+  gpt_param = _GPT_PARAMS["decide_to_react"]
   prompt = DecideToReactPrompt(persona, target_persona, retrieved, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_create_conversation(persona, target_persona, curr_loc,
                                        test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 1000, "temperature": 0.7, "stop": None})
+  gpt_param = _GPT_PARAMS["create_conversation"]
   prompt = CreateConversationPrompt(persona, target_persona, curr_loc, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_summarize_conversation(persona, conversation, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["summarize_conversation"]
   prompt = SummarizeConversationPrompt(persona, conversation, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_extract_keywords(persona, description, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 50, "stop": None})
+  gpt_param = _GPT_PARAMS["extract_keywords"]
   prompt = ExtractKeywordsPrompt(persona, description, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_keyword_to_thoughts(persona, keyword, concept_summary, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 40, "temperature": 0.7, "stop": None})
+  gpt_param = _GPT_PARAMS["keyword_to_thoughts"]
   prompt = KeywordToThoughtsPrompt(persona, keyword, concept_summary, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -295,49 +392,92 @@ def run_gpt_prompt_convo_to_thoughts(persona,
                                     target_persona_name,
                                     convo_str,
                                     fin_target, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 40, "temperature": 0.7, "stop": None})
+  gpt_param = _GPT_PARAMS["convo_to_thoughts"]
   prompt = ConvoToThoughtsPrompt(persona, init_persona_name, target_persona_name, convo_str, fin_target, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_event_poignancy(persona, event_description, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
-  prompt = EventPoignancyPrompt(persona, event_description, verbose)
+  gpt_param = _GPT_PARAMS["event_poignancy"]
+  prompt = PoignancyPrompt(persona, event_description, "event", verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
+def run_gpt_prompt_event_poignancy_batch(persona, event_descriptions, test_input=None, verbose=False): 
+  """
+  Rates the poignancy of several events with a single request rather than 
+  calling run_gpt_prompt_event_poignancy once per event. Idle descriptions 
+  keep their fixed score of 1 and are not sent. 
+
+  INPUT: 
+    persona: The Persona class instance 
+    event_descriptions: a list of event description strs
+  OUTPUT: 
+    a list of integer poignancy scores aligned with event_descriptions.
+  """
+  gpt_param = _GPT_PARAMS["event_poignancy_batch"]
+  scores = [1] * len(event_descriptions)
+  pending = [i for i, d in enumerate(event_descriptions) if "is idle" not in d]
+  if not pending: 
+    return scores, [scores, "", gpt_param, [], []]
+  prompt = EventPoignancyBatchPrompt(persona, [event_descriptions[i] for i in pending], verbose)
+  rated, details = safe_execute_prompt(prompt, gpt_param, test_input)
+  for i, score in zip(pending, rated): 
+    scores[i] = score
+  return scores, details
+
+
 def run_gpt_prompt_thought_poignancy(persona, event_description, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
-  prompt = ThoughtPoignancyPrompt(persona, event_description, verbose)
+  gpt_param = _GPT_PARAMS["thought_poignancy"]
+  prompt = PoignancyPrompt(persona, event_description, "thought", verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_chat_poignancy(persona, event_description, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
-  prompt = ChatPoignancyPrompt(persona, event_description, verbose)
+  gpt_param = _GPT_PARAMS["chat_poignancy"]
+  prompt = PoignancyPrompt(persona, event_description, "chat", verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_focal_pt(persona, statements, n, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["focal_pt"]
   prompt = FocalPtPrompt(persona, statements, n, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_insight_and_guidance(persona, statements, n, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 150, "temperature": 0.5, "stop": None})
+  gpt_param = _GPT_PARAMS["insight_and_guidance"]
   prompt = InsightAndGuidancePrompt(persona, statements, n, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
+def run_gpt_prompt_insight_and_guidance_batch(persona, statements_list, n, verbose=False): 
+  """
+  Runs the insight and guidance prompt for several sets of statements (e.g. 
+  one per reflection focal point) in a single batched completion request. 
+
+  OUTPUT: 
+    the list of outputs and the matching list of debug info lists, both 
+    aligned with statements_list. Each output is a (thoughts, evidence) pair 
+    of parallel lists, where evidence[i] holds the indices of the statements 
+    behind thoughts[i], or the prompt's fail safe if its request failed.
+  """
+  if not statements_list: 
+    return [], []
+  gpt_param = _GPT_PARAMS["insight_and_guidance"]
+  prompts = [InsightAndGuidancePrompt(persona, statements, n, verbose) 
+             for statements in statements_list]
+  return safe_execute_prompts(prompts, gpt_param)
+
+
 def run_gpt_prompt_agent_chat_summarize_ideas(persona, target_persona, statements, curr_context, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["agent_chat_summarize_ideas"]
   prompt = AgentChatSummarizeIdeasPrompt(persona, target_persona, statements, curr_context, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_agent_chat_summarize_relationship(persona, target_persona, statements, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["agent_chat_summarize_relationship"]
   prompt = AgentChatSummarizeRelationshipPrompt(persona, target_persona, statements, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
@@ -346,191 +486,200 @@ def run_gpt_prompt_agent_chat(maze, persona, target_persona,
                                curr_context, 
                                init_summ_idea, 
                                target_summ_idea, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["agent_chat"]
   prompt = AgentChatPrompt(persona, maze, target_persona, curr_context, init_summ_idea, target_summ_idea, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_summarize_ideas(persona, statements, question, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["summarize_ideas"]
   prompt = SummarizeIdeasPrompt(persona, statements, question, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_generate_next_convo_line(persona, interlocutor_desc, prev_convo, retrieved_summary, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 250, "temperature": 1, "stop": None})
+  gpt_param = _GPT_PARAMS["generate_next_convo_line"]
   prompt = GenerateNextConvoLinePrompt(persona, interlocutor_desc, prev_convo, retrieved_summary, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_generate_whisper_inner_thought(persona, whisper, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 50, "stop": None})
+  gpt_param = _GPT_PARAMS["generate_whisper_inner_thought"]
   prompt = WhisperInnerThoughtPrompt(persona, whisper, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_planning_thought_on_convo(persona, all_utt, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 50, "stop": None})
+  gpt_param = _GPT_PARAMS["planning_thought_on_convo"]
   prompt = PlanningThoughtOnConvoPrompt(persona, all_utt, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
 def run_gpt_prompt_memo_on_convo(persona, all_utt, test_input=None, verbose=False): 
-  gpt_param = get_gpt_param({"max_tokens": 15, "stop": None})
+  gpt_param = _GPT_PARAMS["memo_on_convo"]
   prompt = MemoOnConvoPrompt(persona, all_utt, verbose)
   return safe_execute_prompt(prompt, gpt_param, test_input)
 
 
+# The validate/clean_up callbacks of the two chat wrappers below are defined 
+# once at module level rather than re-created as closures on every call. 
+def _safety_score_clean_up(gpt_response, prompt=""): 
+  return gpt_response["output"]
+
+
+def _safety_score_validate(gpt_response, prompt=""): 
+  fields = ["output"]
+  if gpt_response is None: 
+    return False
+  for field in fields: 
+    if field not in gpt_response: 
+      return False
+  return True
+
+
 def run_gpt_generate_safety_score(persona, comment, test_input=None, verbose=False): 
   def create_prompt_input(comment, test_input=None):
     prompt_input = [comment]
     return prompt_input
 
-  def __chat_func_clean_up(gpt_response, prompt=""): 
-    gpt_response = json.loads(gpt_response)
-    return gpt_response["output"]
-
-  def __chat_func_validate(gpt_response, prompt=""): 
-    try: 
-      fields = ["output"]
-      response = json.loads(gpt_response)
-      for field in fields: 
-        if field not in response: 
-          return False
-      return True
-    except:
-      return False 
-
-  def get_fail_safe():
-    return None
-
-  print ("11")
   prompt_template = "persona/prompt_template/safety/anthromorphosization_v1.txt" 
   prompt_input = create_prompt_input(comment) 
-  print ("22")
   prompt = generate_prompt(prompt_input, prompt_template)
-  print (prompt)
-  fail_safe = get_fail_safe() 
-  output = ChatGPT_safe_generate_response_OLD(prompt, 3, fail_safe,
-                        __chat_func_validate, __chat_func_clean_up, verbose)
-  print (output)
+  logger.debug("safety_score prompt:\n%s", prompt)
+  fail_safe = None
+  output = ChatGPT_safe_generate_response_OLD(prompt, _MAX_ATTEMPTS, fail_safe,
+                        _safety_score_validate, _safety_score_clean_up, verbose,
+                        func_parse=extract_first_json_dict,
+                        timeout=_SAFETY_SCORE_TIMEOUT,
+                        on_timeout=lambda attempt: _log_timeout(
+                          prompt_template, persona, _SAFETY_SCORE_TIMEOUT, attempt))
+  logger.debug("safety_score output: %s", output)
   
-  gpt_param = {"engine": "gpt-3.5-turbo-instruct", "max_tokens": 50, 
-               "temperature": 0, "top_p": 1, "stream": False,
-               "frequency_penalty": 0, "presence_penalty": 0, "stop": None}
+  gpt_param = _GPT_PARAMS["safety_score"]
   return output, [output, prompt, gpt_param, prompt_input, fail_safe]
 
 
+def _scan_first_json_object(data_str):
+  """
+  Scans the string once, tracking brace depth and string state, and returns
+  the span of the first balanced top-level JSON object. Unlike a naive
+  find('{') / find('}'), this does not truncate nested objects or stop at
+  braces that appear inside string values. Quotes are only tracked inside 
+  the object, so a stray quote in the text before it is ignored.
+
+  INPUT: 
+    data_str: a str that may contain a JSON object surrounded by other text
+  OUTPUT: 
+    the str of the first balanced {...} object, or None if there is none.
+  """
+  depth = 0
+  in_str = False
+  esc = False
+  start = -1
+  for i, c in enumerate(data_str): 
+    if in_str: 
+      if esc: 
+        esc = False
+      elif c == "\\": 
+        esc = True
+      elif c == '"': 
+        in_str = False
+    elif c == '"' and depth > 0: 
+      in_str = True
+    elif c == "{": 
+      if depth == 0: 
+        start = i
+      depth += 1
+    elif c == "}" and depth > 0: 
+      depth -= 1
+      if depth == 0: 
+        return data_str[start:i+1]
+  return None
+
 
 def extract_first_json_dict(data_str):
-    # Find the first occurrence of a JSON object within the string
-    start_idx = data_str.find('{')
-    end_idx = data_str.find('}', start_idx) + 1
+  """
+  Returns the first JSON object embedded in data_str parsed into a dict, or
+  None if no balanced object is found or it fails to parse.
+  """
+  json_str = _scan_first_json_object(data_str)
+  if json_str is None: 
+    return None
+  try: 
+    return json_loads(json_str)
+  except json.JSONDecodeError: 
+    return None
 
-    # Check if both start and end indices were found
-    if start_idx == -1 or end_idx == 0:
-        return None
 
-    # Extract the first JSON dictionary
-    json_str = data_str[start_idx:end_idx]
+# Shared and read-only, so a retry storm does not build a new dict per call.
+_ITERATIVE_CHAT_UTT_FAIL_SAFE = MappingProxyType({"utterance": "...", "end": False})
 
-    try:
-        # Attempt to parse the JSON data
-        json_dict = json.loads(json_str)
-        return json_dict
-    except json.JSONDecodeError:
-        # If parsing fails, return None
-        return None
+
+def _iterative_chat_utt_clean_up(gpt_response, prompt=""): 
+  cleaned_dict = dict()
+  cleaned = []
+  for key, val in gpt_response.items(): 
+    cleaned += [val]
+  cleaned_dict["utterance"] = cleaned[0]
+  cleaned_dict["end"] = True
+  if "f" in str(cleaned[1]) or "F" in str(cleaned[1]): 
+    cleaned_dict["end"] = False
+
+  return cleaned_dict
+
+
+def _iterative_chat_utt_validate(gpt_response, prompt=""): 
+  logger.debug("iterative_chat_utt parsed response: %s", gpt_response)
+  return gpt_response is not None
 
 
 def run_gpt_generate_iterative_chat_utt(maze, init_persona, target_persona, retrieved, curr_context, curr_chat, test_input=None, verbose=False): 
   def create_prompt_input(maze, init_persona, target_persona, retrieved, curr_context, curr_chat, test_input=None):
-    persona = init_persona
-    prev_convo_insert = "\n"
-    if persona.a_mem.seq_chat: 
-      for i in persona.a_mem.seq_chat: 
-        if i.object == target_persona.scratch.name: 
-          v1 = int((persona.scratch.curr_time - i.created).total_seconds()/60)
-          prev_convo_insert += f'{str(v1)} minutes ago, {persona.scratch.name} and {target_persona.scratch.name} were already {i.description} This context takes place after that conversation.'
-          break
-    if prev_convo_insert == "\n": 
-      prev_convo_insert = ""
-    if persona.a_mem.seq_chat: 
-      if int((persona.scratch.curr_time - persona.a_mem.seq_chat[-1].created).total_seconds()/60) > 480: 
-        prev_convo_insert = ""
-    print (prev_convo_insert)
-
-    curr_sector = f"{maze.access_tile(persona.scratch.curr_tile)['sector']}"
-    curr_arena= f"{maze.access_tile(persona.scratch.curr_tile)['arena']}"
-    curr_location = f"{curr_arena} in {curr_sector}"
-
-    retrieved_str = ""
-    for key, vals in retrieved.items(): 
-      for v in vals: 
-        retrieved_str += f"- {v.description}\n"
-
-
-    convo_str = ""
-    for i in curr_chat:
-      convo_str += ": ".join(i) + "\n"
+    scratch = init_persona.scratch
+    init_name = scratch.name
+    tgt_name = target_persona.scratch.name
+    curr_time = scratch.curr_time
+
+    prev_convo_insert = ""
+    seq_chat = init_persona.a_mem.seq_chat
+    if seq_chat and int((curr_time - seq_chat[-1].created).total_seconds()/60) <= 480: 
+      prev_chat = next((i for i in seq_chat if i.object == tgt_name), None)
+      if prev_chat: 
+        v1 = int((curr_time - prev_chat.created).total_seconds()/60)
+        prev_convo_insert = f'\n{v1} minutes ago, {init_name} and {tgt_name} were already {prev_chat.description} This context takes place after that conversation.'
+    logger.debug("iterative_chat_utt prev_convo_insert: %s", prev_convo_insert)
+
+    curr_tile = maze.access_tile(scratch.curr_tile)
+    curr_location = f"{curr_tile['arena']} in {curr_tile['sector']}"
+
+    retrieved_str = "".join(f"- {v.description}\n"
+                            for vals in retrieved.values() for v in vals)
+
+    convo_str = "".join(f"{': '.join(i)}\n" for i in curr_chat)
     if convo_str == "": 
       convo_str = "[The conversation has not started yet -- start it!]"
 
-    init_iss = f"Here is Here is a brief description of {init_persona.scratch.name}.\n{init_persona.scratch.get_str_iss()}"
-    prompt_input = [init_iss, init_persona.scratch.name, retrieved_str, prev_convo_insert,
-      curr_location, curr_context, init_persona.scratch.name, target_persona.scratch.name,
-      convo_str, init_persona.scratch.name, target_persona.scratch.name,
-      init_persona.scratch.name, init_persona.scratch.name,
-      init_persona.scratch.name
+    init_iss = f"Here is Here is a brief description of {init_name}.\n{scratch.get_str_iss()}"
+    prompt_input = [init_iss, init_name, retrieved_str, prev_convo_insert,
+      curr_location, curr_context, init_name, tgt_name,
+      convo_str, init_name, tgt_name,
+      init_name, init_name,
+      init_name
       ]
     return prompt_input
 
-  def __chat_func_clean_up(gpt_response, prompt=""): 
-    gpt_response = extract_first_json_dict(gpt_response)
-
-    cleaned_dict = dict()
-    cleaned = []
-    for key, val in gpt_response.items(): 
-      cleaned += [val]
-    cleaned_dict["utterance"] = cleaned[0]
-    cleaned_dict["end"] = True
-    if "f" in str(cleaned[1]) or "F" in str(cleaned[1]): 
-      cleaned_dict["end"] = False
-
-    return cleaned_dict
-
-  def __chat_func_validate(gpt_response, prompt=""): 
-    print ("ugh...")
-    try: 
-      # print ("DEBUG 1")
-      # print (gpt_response)
-      # print ("DEBUG 2")
-
-      print (extract_first_json_dict(gpt_response))
-      # print ("DEBUG 3")
-
-      return True
-    except:
-      return False 
-
-  def get_fail_safe():
-    cleaned_dict = dict()
-    cleaned_dict["utterance"] = "..."
-    cleaned_dict["end"] = False
-    return cleaned_dict
-
-  print ("11")
   prompt_template = "persona/prompt_template/v3_ChatGPT/iterative_convo_v1.txt" 
   prompt_input = create_prompt_input(maze, init_persona, target_persona, retrieved, curr_context, curr_chat) 
-  print ("22")
   prompt = generate_prompt(prompt_input, prompt_template)
-  print (prompt)
-  fail_safe = get_fail_safe() 
-  output = ChatGPT_safe_generate_response_OLD(prompt, 3, fail_safe,
-                        __chat_func_validate, __chat_func_clean_up, verbose)
-  print (output)
+  logger.debug("iterative_chat_utt prompt:\n%s", prompt)
+  fail_safe = _ITERATIVE_CHAT_UTT_FAIL_SAFE
+  output = ChatGPT_safe_generate_response_OLD(prompt, _MAX_ATTEMPTS, fail_safe,
+                        _iterative_chat_utt_validate, _iterative_chat_utt_clean_up, verbose,
+                        func_parse=extract_first_json_dict,
+                        timeout=_ITERATIVE_CHAT_UTT_TIMEOUT,
+                        on_timeout=lambda attempt: _log_timeout(
+                          prompt_template, init_persona, _ITERATIVE_CHAT_UTT_TIMEOUT, attempt))
+  logger.debug("iterative_chat_utt output: %s", output)
   
-  gpt_param = {"engine": "gpt-3.5-turbo-instruct", "max_tokens": 50, 
-               "temperature": 0, "top_p": 1, "stream": False,
-               "frequency_penalty": 0, "presence_penalty": 0, "stop": None}
+  gpt_param = _GPT_PARAMS["iterative_chat_utt"]
   return output, [output, prompt, gpt_param, prompt_input, fail_safe]
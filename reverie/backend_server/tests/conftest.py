@@ -0,0 +1,15 @@
+import os
+import sys
+
+# Make the project root, the backend server and this directory (for the
+# shared test helpers) importable for every test module; the test modules do
+# no path setup of their own. The root goes first so that `reverie` resolves
+# to the package rather than to backend_server/reverie.py when pytest is
+# started from backend_server.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
+BACKEND_SERVER = os.path.join(ROOT, 'reverie', 'backend_server')
+TESTS = os.path.dirname(os.path.abspath(__file__))
+for path in (TESTS, BACKEND_SERVER, ROOT):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
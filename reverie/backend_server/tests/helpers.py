@@ -0,0 +1,21 @@
+"""
+Test doubles shared by the test modules in this directory.
+"""
+
+
+class CallRecorder:
+    """
+    Callable that counts its calls, keeps the (args, kwargs) of the last one
+    and returns a fixed value; none of Mock's signature checks or call lists.
+    """
+    __slots__ = ("n", "last_call", "return_value")
+
+    def __init__(self, return_value=None):
+        self.n = 0
+        self.last_call = None
+        self.return_value = return_value
+
+    def __call__(self, *args, **kwargs):
+        self.n += 1
+        self.last_call = (args, kwargs)
+        return self.return_value
@@ -3,13 +3,6 @@ import shutil
 import tempfile
 import os
 import json
-import sys
-
-# Add the project root to sys.path
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
-backend_server_path = os.path.join(project_root, 'reverie', 'backend_server')
-sys.path.append(project_root)
-sys.path.append(backend_server_path)
 
 from reverie.backend_server.persona.memory_structures.repository.json_repository import JsonMemoryRepository
 from reverie.backend_server.persona.memory_structures.spatial_memory import MemoryTree
@@ -17,24 +10,26 @@ from reverie.backend_server.persona.memory_structures.associative_memory import
 from reverie.backend_server.persona.memory_structures.scratch import Scratch
 
 class TestJsonMemoryRepository(unittest.TestCase):
-    def setUp(self):
-        # Create a temporary directory
-        self.test_dir = tempfile.mkdtemp()
-        self.bootstrap_dir = os.path.join(self.test_dir, "bootstrap_memory")
-        os.makedirs(self.bootstrap_dir)
+    @classmethod
+    def setUpClass(cls):
+        # The bootstrap files are only ever read, and every save test writes
+        # to its own folder, so one fixture directory serves the whole class.
+        cls.test_dir = tempfile.mkdtemp()
+        cls.bootstrap_dir = os.path.join(cls.test_dir, "bootstrap_memory")
+        os.makedirs(cls.bootstrap_dir)
         
         # Setup paths
-        self.spatial_path = os.path.join(self.bootstrap_dir, "spatial_memory.json")
-        self.associative_dir = os.path.join(self.bootstrap_dir, "associative_memory")
-        self.scratch_path = os.path.join(self.bootstrap_dir, "scratch.json")
+        cls.spatial_path = os.path.join(cls.bootstrap_dir, "spatial_memory.json")
+        cls.associative_dir = os.path.join(cls.bootstrap_dir, "associative_memory")
+        cls.scratch_path = os.path.join(cls.bootstrap_dir, "scratch.json")
         
         # Create dummy data for loading tests
-        self.spatial_data = {"world": {"sector": {"arena": ["obj"]}}}
-        with open(self.spatial_path, "w") as f:
-            json.dump(self.spatial_data, f)
+        cls.spatial_data = {"world": {"sector": {"arena": ["obj"]}}}
+        with open(cls.spatial_path, "w") as f:
+            json.dump(cls.spatial_data, f)
             
-        os.makedirs(self.associative_dir)
-        self.nodes_data = {
+        os.makedirs(cls.associative_dir)
+        cls.nodes_data = {
             "node_1": {
                 "node_count": 1, 
                 "type_count": 1, 
@@ -52,17 +47,17 @@ class TestJsonMemoryRepository(unittest.TestCase):
                 "filling": []
             }
         }
-        self.embeddings_data = {"key": [0.1, 0.2]}
-        self.kw_strength_data = {"kw_strength_event": {}, "kw_strength_thought": {}}
+        cls.embeddings_data = {"key": [0.1, 0.2]}
+        cls.kw_strength_data = {"kw_strength_event": {}, "kw_strength_thought": {}}
         
-        with open(os.path.join(self.associative_dir, "nodes.json"), "w") as f:
-            json.dump(self.nodes_data, f)
-        with open(os.path.join(self.associative_dir, "embeddings.json"), "w") as f:
-            json.dump(self.embeddings_data, f)
-        with open(os.path.join(self.associative_dir, "kw_strength.json"), "w") as f:
-            json.dump(self.kw_strength_data, f)
+        with open(os.path.join(cls.associative_dir, "nodes.json"), "w") as f:
+            json.dump(cls.nodes_data, f)
+        with open(os.path.join(cls.associative_dir, "embeddings.json"), "w") as f:
+            json.dump(cls.embeddings_data, f)
+        with open(os.path.join(cls.associative_dir, "kw_strength.json"), "w") as f:
+            json.dump(cls.kw_strength_data, f)
             
-        self.scratch_data = {
+        cls.scratch_data = {
             "vision_r": 4, 
             "att_bandwidth": 3, 
             "retention": 5, 
@@ -108,14 +103,15 @@ class TestJsonMemoryRepository(unittest.TestCase):
             "act_path_set": False, 
             "planned_path": []
         }
-        with open(self.scratch_path, "w") as f:
-            json.dump(self.scratch_data, f)
+        with open(cls.scratch_path, "w") as f:
+            json.dump(cls.scratch_data, f)
 
-        self.repo = JsonMemoryRepository(self.test_dir)
+        cls.repo = JsonMemoryRepository(cls.test_dir)
 
-    def tearDown(self):
-        # Remove the directory after the test
-        shutil.rmtree(self.test_dir)
+    @classmethod
+    def tearDownClass(cls):
+        # Remove the directory after the tests
+        shutil.rmtree(cls.test_dir)
 
     def test_load_spatial_memory(self):
         memory = self.repo.load_spatial_memory()
@@ -158,6 +154,16 @@ class TestJsonMemoryRepository(unittest.TestCase):
         self.assertTrue(os.path.exists(os.path.join(out_folder, "embeddings.json")))
         self.assertTrue(os.path.exists(os.path.join(out_folder, "kw_strength.json")))
 
+    def test_associative_memory_round_trip(self):
+        save_dir = os.path.join(self.test_dir, "save_test_round_trip")
+        
+        memory = self.repo.load_associative_memory()
+        self.repo.save_associative_memory(memory, os.path.join(save_dir, "bootstrap_memory"))
+        
+        reloaded = JsonMemoryRepository(save_dir).load_associative_memory()
+        self.assertEqual(reloaded.embeddings, self.embeddings_data)
+        self.assertEqual(reloaded.get_state()["nodes"], memory.get_state()["nodes"])
+
     def test_load_scratch(self):
         scratch = self.repo.load_scratch()
         self.assertIsInstance(scratch, Scratch)
@@ -178,6 +184,3 @@ class TestJsonMemoryRepository(unittest.TestCase):
         with open(expected_path) as f:
             data = json.load(f)
         self.assertEqual(data["vision_r"], 10)
-
-if __name__ == '__main__':
-    unittest.main()
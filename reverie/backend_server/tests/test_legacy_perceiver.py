@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import datetime
+
+from persona.cognitive_modules.perceiver import legacy as legacy_mod
+from persona.cognitive_modules.perceiver.legacy import LegacyPerceiver
+from reverie.backend_server.persona.memory_structures.associative_memory import AssociativeMemory
+
+class TestLegacyPerceiver(unittest.TestCase):
+    def setUp(self):
+        self.scratch = MagicMock()
+        self.scratch.name = "Isabella Rodriguez"
+        self.scratch.curr_tile = (1, 1)
+        self.scratch.curr_time = datetime.datetime(2023, 2, 13, 9, 0)
+        self.scratch.vision_r = 4
+        self.scratch.att_bandwidth = 5
+        self.scratch.retention = 5
+        self.scratch.importance_trigger_curr = 100
+        self.scratch.importance_ele_n = 0
+        self.scratch.s_mem.tree = {}
+        self.scratch.a_mem = AssociativeMemory()
+
+        self.events = [
+            ("the Ville:cafe:counter:coffee machine", "is", "brewing", "brewing coffee"),
+            ("Klaus Mueller", "is", "reading", "reading a book"),
+            ("the Ville:cafe:counter:fridge", None, None, None),
+        ]
+        self.maze = MagicMock()
+        self.maze.get_nearby_tiles.return_value = [(1, 1)]
+        self.maze.access_tile.return_value = {"world": "", "sector": "", "arena": "",
+                                              "game_object": "", "events": set(self.events)}
+        self.maze.get_tile_path.return_value = "the Ville:cafe:counter"
+
+        self.perceiver = LegacyPerceiver(self.scratch)
+
+    @patch.object(legacy_mod, 'get_embedding', return_value=[0.1])
+    @patch.object(legacy_mod, 'run_gpt_prompt_event_poignancy')
+    @patch.object(legacy_mod, 'run_gpt_prompt_event_poignancy_batch')
+    def test_new_events_are_scored_in_one_request(self, mock_batch, mock_single, _):
+        mock_batch.side_effect = lambda persona, descs: ([len(d) % 10 for d in descs], "debug")
+
+        ret_events = self.perceiver.perceive(self.maze)
+
+        self.assertEqual(len(ret_events), 3)
+        mock_batch.assert_called_once()
+        mock_single.assert_not_called()
+        scored = mock_batch.call_args[0][1]
+        self.assertEqual(sorted(scored), ["Klaus Mueller is reading a book",
+                                          "coffee machine is brewing coffee",
+                                          "fridge is idle"])
+        poignancy = {e.description: e.poignancy for e in ret_events}
+        self.assertEqual(poignancy["fridge is idle"], 4)
+        self.assertEqual(poignancy["Klaus Mueller is reading a book"], 1)
+        self.assertEqual(self.scratch.importance_ele_n, 3)
+        self.assertEqual(self.scratch.importance_trigger_curr,
+                         100 - sum(e.poignancy for e in ret_events))
+
+    @patch.object(legacy_mod, 'get_embedding', return_value=[0.1])
+    @patch.object(legacy_mod, 'run_gpt_prompt_event_poignancy_batch')
+    def test_recent_events_are_not_added_again(self, mock_batch, _):
+        mock_batch.side_effect = lambda persona, descs: ([5] * len(descs), "debug")
+        self.perceiver.perceive(self.maze)
+        mock_batch.reset_mock()
+
+        self.assertEqual(self.perceiver.perceive(self.maze), [])
+        # Nothing is left to score, so no request is made
+        mock_batch.assert_called_once_with(self.scratch, [])
@@ -1,37 +1,67 @@
-
-import sys
-from unittest.mock import MagicMock, patch
 import unittest
+from unittest.mock import DEFAULT, MagicMock, Mock, patch
+import collections
 import datetime
+from types import SimpleNamespace
+
+# The module under test is imported once, here, so the patches below can
+# target it directly.
+from persona.cognitive_modules.reflector import legacy as legacy_mod
+
+from helpers import CallRecorder
+
+LegacyReflector = legacy_mod.LegacyReflector
+
+# Canned LLM responses shared by the tests; tuples, so safe to reuse.
+_TRIPLE = (("S", "P", "O"), "debug")
+_POIGNANCY = (5, "debug")
+_EMBEDDING = (0.1, 0.2, 0.3)
 
-# Mock selenium to avoid ImportError
-sys.modules["selenium"] = MagicMock()
-sys.modules["selenium.webdriver"] = MagicMock()
+T_10AM = datetime.datetime(2023, 1, 1, 10, 0, 0)
+T_11AM = datetime.datetime(2023, 1, 1, 11, 0, 0)
+T_NOON = datetime.datetime(2023, 1, 1, 12, 0, 0)
+TEN_SECONDS = datetime.timedelta(seconds=10)
 
-# Mock reverie.backend_server.infra.llm to avoid further import issues
-mock_llm = MagicMock()
-sys.modules["reverie.backend_server.infra.llm"] = mock_llm
+# Stand-in for the memory nodes the reflector reads; it never writes to them.
+Node = collections.namedtuple('Node', ['embedding_key', 'node_id', 'last_accessed'],
+                              defaults=[None, None, None])
 
-# Now we can import the module under test
-from persona.cognitive_modules.reflector.legacy import LegacyReflector
 
 class TestLegacyReflector(unittest.TestCase):
+    # Scratch fields the tests change; restored before each test.
+    SCRATCH_DEFAULTS = dict(
+        curr_time=T_NOON,
+        importance_trigger_max=100,
+        importance_trigger_curr=100,
+        importance_ele_n=0,
+        chatting_end_time=None,
+        chatting_with=None,
+        chat=None,
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        # Plain namespaces for the state the reflector only reads; real mocks
+        # only for the calls the tests assert on. Built once, reset per test.
+        cls.mock_persona = SimpleNamespace(
+            a_mem=SimpleNamespace(seq_event=[], seq_thought=[],
+                                  add_thought=None, get_last_chat=Mock()),
+            retriever=SimpleNamespace(retrieve_weighted=Mock()),
+        )
+        cls.mock_persona.scratch = SimpleNamespace(name="Test Persona",
+                                                   a_mem=cls.mock_persona.a_mem)
+
     def setUp(self):
-        # Mock the Persona object
-        self.mock_persona = MagicMock()
-        self.mock_persona.scratch.name = "Test Persona"
-        self.mock_persona.scratch.curr_time = datetime.datetime(2023, 1, 1, 12, 0, 0)
-        self.mock_persona.scratch.importance_trigger_max = 100
-        self.mock_persona.scratch.importance_trigger_curr = 100
-        self.mock_persona.scratch.importance_ele_n = 0
-        self.mock_persona.scratch.chatting_end_time = None
-        
-        # Mock associative memory
-        self.mock_persona.a_mem.seq_event = []
-        self.mock_persona.a_mem.seq_thought = []
-        
-        # Initialize the LegacyReflector with the mocked persona
-        self.reflector = LegacyReflector(self.mock_persona)
+        vars(self.mock_persona.scratch).update(self.SCRATCH_DEFAULTS)
+        a_mem = self.mock_persona.a_mem
+        a_mem.seq_event = []
+        a_mem.seq_thought = []
+        a_mem.add_thought = CallRecorder()
+        a_mem.get_last_chat.reset_mock(return_value=True)
+        self.mock_persona.retriever.retrieve_weighted.reset_mock(return_value=True)
+
+        # Tests stub methods on the instance, so each gets its own reflector.
+        self.reflector = LegacyReflector(self.mock_persona.scratch, self.mock_persona.retriever)
 
     def test_reflection_trigger_false(self):
         """
@@ -47,7 +77,7 @@ class TestLegacyReflector(unittest.TestCase):
         """
         self.mock_persona.scratch.importance_trigger_curr = 0
         # Add a dummy event to ensure the list is not empty
-        self.mock_persona.a_mem.seq_event = [MagicMock()]
+        self.mock_persona.a_mem.seq_event = [Node()]
         self.assertTrue(self.reflector._reflection_trigger())
 
     def test_reflection_trigger_empty_memory(self):
@@ -72,21 +102,15 @@ class TestLegacyReflector(unittest.TestCase):
         self.assertEqual(self.mock_persona.scratch.importance_trigger_curr, 100)
         self.assertEqual(self.mock_persona.scratch.importance_ele_n, 0)
 
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_focal_pt')
+    @patch.object(legacy_mod, 'run_gpt_prompt_focal_pt')
     def test_generate_focal_points(self, mock_run_gpt):
         """
         Test _generate_focal_points calls the GPT prompt correctly.
         """
-        # Setup mock nodes
-        mock_node1 = MagicMock()
-        mock_node1.last_accessed = datetime.datetime(2023, 1, 1, 10, 0, 0)
-        mock_node1.embedding_key = "Event 1"
-        
-        mock_node2 = MagicMock()
-        mock_node2.last_accessed = datetime.datetime(2023, 1, 1, 11, 0, 0)
-        mock_node2.embedding_key = "Event 2"
-        
-        self.mock_persona.a_mem.seq_event = [mock_node1, mock_node2]
+        self.mock_persona.a_mem.seq_event = [
+            Node(embedding_key="Event 1", last_accessed=T_10AM),
+            Node(embedding_key="Event 2", last_accessed=T_11AM),
+        ]
         self.mock_persona.scratch.importance_ele_n = 2
         
         # Mock GPT response
@@ -97,24 +121,16 @@ class TestLegacyReflector(unittest.TestCase):
         self.assertEqual(focal_points, ["Focal Point 1", "Focal Point 2"])
         mock_run_gpt.assert_called_once()
 
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_insight_and_guidance')
+    @patch.object(legacy_mod, 'run_gpt_prompt_insight_and_guidance')
     def test_generate_insights_and_evidence(self, mock_run_gpt):
         """
         Test _generate_insights_and_evidence processes nodes and GPT response correctly.
         """
-        # Setup mock nodes
-        mock_node1 = MagicMock()
-        mock_node1.embedding_key = "Node 1"
-        mock_node1.node_id = "id_1"
+        nodes = [Node(embedding_key="Node 1", node_id="id_1"),
+                 Node(embedding_key="Node 2", node_id="id_2")]
         
-        mock_node2 = MagicMock()
-        mock_node2.embedding_key = "Node 2"
-        mock_node2.node_id = "id_2"
-        
-        nodes = [mock_node1, mock_node2]
-        
-        # Mock GPT response: Dictionary mapping thought to list of evidence indices
-        mock_run_gpt.return_value = ({"Insight 1": [0], "Insight 2": [1]}, "debug_info")
+        # Mock GPT response: parallel lists of thoughts and evidence indices
+        mock_run_gpt.return_value = ((["Insight 1", "Insight 2"], [[0], [1]]), "debug_info")
         
         insights = self.reflector._generate_insights_and_evidence(nodes, 2)
         
@@ -122,71 +138,71 @@ class TestLegacyReflector(unittest.TestCase):
         expected_insights = {"Insight 1": ["id_1"], "Insight 2": ["id_2"]}
         self.assertEqual(insights, expected_insights)
 
-    @patch('persona.cognitive_modules.reflector.legacy.get_embedding')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_event_poignancy')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_event_triple')
-    def test_run_reflect(self, mock_triple, mock_poignancy, mock_embedding):
+    @patch.multiple(legacy_mod,
+                    run_gpt_prompt_event_triple=DEFAULT,
+                    run_gpt_prompt_event_poignancy_batch=DEFAULT,
+                    get_embedding=DEFAULT)
+    def test_run_reflect(self, **mocks):
         """
         Test the full _run_reflect flow.
         """
         # Mock internal methods to isolate _run_reflect logic
         self.reflector._generate_focal_points = MagicMock(return_value=["Focal Point"])
         
-        mock_node = MagicMock()
-        mock_node.embedding_key = "Node Key"
-        self.mock_persona.retriever.retrieve_weighted.return_value = {"Focal Point": [mock_node]}
+        self.mock_persona.retriever.retrieve_weighted.return_value = {
+            "Focal Point": [Node(embedding_key="Node Key")]}
         
-        self.reflector._generate_insights_and_evidence = MagicMock(return_value={"New Thought": ["evidence_id"]})
+        self.reflector._generate_insights_and_evidence_batch = MagicMock(return_value=[{"New Thought": ["evidence_id"]}])
         
         # Mock GPT and embedding responses
-        mock_triple.return_value = (("Subject", "Predicate", "Object"), "debug")
-        mock_poignancy.return_value = (5, "debug")
-        mock_embedding.return_value = [0.1, 0.2, 0.3]
+        mocks["run_gpt_prompt_event_triple"].return_value = _TRIPLE
+        mocks["run_gpt_prompt_event_poignancy_batch"].return_value = ([5], "debug")
+        mocks["get_embedding"].return_value = _EMBEDDING
         
         self.reflector._run_reflect()
         
         # Verify that a thought was added to memory
-        self.mock_persona.a_mem.add_thought.assert_called_once()
-        args, _ = self.mock_persona.a_mem.add_thought.call_args
+        self.assertEqual(self.mock_persona.a_mem.add_thought.n, 1)
+        args, kwargs = self.mock_persona.a_mem.add_thought.last_call
+        self.assertEqual(kwargs, {})
         
         # Check arguments passed to add_thought
         # (created, expiration, s, p, o, thought, keywords, thought_poignancy, thought_embedding_pair, evidence)
         self.assertEqual(args[5], "New Thought")
+        self.assertEqual(args[7], 5)
         self.assertEqual(args[9], ["evidence_id"])
+        # All thoughts for a focal point are scored in a single request
+        mocks["run_gpt_prompt_event_poignancy_batch"].assert_called_once()
 
-    @patch('persona.cognitive_modules.reflector.legacy.get_embedding')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_memo_on_convo')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_planning_thought_on_convo')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_chat_poignancy')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_event_poignancy')
-    @patch('persona.cognitive_modules.reflector.legacy.run_gpt_prompt_event_triple')
-    def test_reflect_chat_end(self, mock_triple, mock_event_poig, mock_chat_poig, mock_planning, mock_memo, mock_embedding):
+    @patch.multiple(legacy_mod,
+                    run_gpt_prompt_event_triple=DEFAULT,
+                    run_gpt_prompt_event_poignancy=DEFAULT,
+                    run_gpt_prompt_chat_poignancy=DEFAULT,
+                    run_gpt_prompt_planning_thought_on_convo=DEFAULT,
+                    run_gpt_prompt_memo_on_convo=DEFAULT,
+                    get_embedding=DEFAULT)
+    def test_reflect_chat_end(self, **mocks):
         """
         Test reflect method when a chat has just ended.
         """
         # Setup chat end condition
-        curr_time = datetime.datetime(2023, 1, 1, 12, 0, 0)
+        curr_time = T_NOON
         self.mock_persona.scratch.curr_time = curr_time
-        # Chat ends 10 minutes from now? Wait, let's check the code.
-        # if self.persona.scratch.curr_time + datetime.timedelta(0,10) == self.persona.scratch.chatting_end_time:
-        # This implies checking if we are 10 seconds? or minutes? before end time?
-        # datetime.timedelta(0, 10) is 10 seconds.
-        
-        self.mock_persona.scratch.chatting_end_time = curr_time + datetime.timedelta(seconds=10)
+        # Chat reflection fires when the chat ends exactly CHAT_END_LEAD
+        # (ten seconds) after the current time.
+        self.mock_persona.scratch.chatting_end_time = curr_time + TEN_SECONDS
         self.mock_persona.scratch.chat = [["User", "Hello"], ["Agent", "Hi"]]
         self.mock_persona.scratch.chatting_with = "Other Agent"
         
         # Mock last chat node
-        mock_chat_node = MagicMock()
-        mock_chat_node.node_id = "chat_node_id"
-        self.mock_persona.a_mem.get_last_chat.return_value = mock_chat_node
+        self.mock_persona.a_mem.get_last_chat.return_value = Node(node_id="chat_node_id")
         
         # Mock GPT responses
-        mock_planning.return_value = ("Planning thought", "debug")
-        mock_memo.return_value = ("Memo thought", "debug")
-        mock_triple.return_value = (("S", "P", "O"), "debug")
-        mock_event_poig.return_value = (5, "debug") # For thought poignancy
-        mock_embedding.return_value = [0.1]
+        mocks["run_gpt_prompt_planning_thought_on_convo"].return_value = ("Planning thought", "debug")
+        mocks["run_gpt_prompt_memo_on_convo"].return_value = ("Memo thought", "debug")
+        mocks["run_gpt_prompt_event_triple"].return_value = _TRIPLE
+        mocks["run_gpt_prompt_event_poignancy"].return_value = _POIGNANCY # For thought poignancy
+        mocks["get_embedding"].return_value = _EMBEDDING
         
         # Ensure reflection trigger is false so we only test the chat part
         self.reflector._reflection_trigger = MagicMock(return_value=False)
@@ -194,7 +210,4 @@ class TestLegacyReflector(unittest.TestCase):
         self.reflector.reflect()
         
         # Should add two thoughts: one for planning, one for memo
-        self.assertEqual(self.mock_persona.a_mem.add_thought.call_count, 2)
-
-if __name__ == '__main__':
-    unittest.main()
+        self.assertEqual(self.mock_persona.a_mem.add_thought.n, 2)
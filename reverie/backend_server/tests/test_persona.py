@@ -1,52 +1,72 @@
 import unittest
-from unittest.mock import MagicMock, patch
-import sys
-import os
+from unittest.mock import DEFAULT, Mock, patch
 import datetime
-
-# Add project root to sys.path
-project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../..'))
-backend_server_path = os.path.join(project_root, 'reverie', 'backend_server')
-sys.path.append(project_root)
-sys.path.append(backend_server_path)
+from types import SimpleNamespace
 
 from reverie.backend_server.persona.persona import Persona
 
-class TestPersona(unittest.TestCase):
-    def setUp(self):
-        # Patch the dependencies
-        # We patch the classes where they are imported in persona.py
-        self.repo_patcher = patch('reverie.backend_server.persona.persona.JsonMemoryRepository')
-        self.mock_repo_cls = self.repo_patcher.start()
-        self.mock_repo = self.mock_repo_cls.return_value
-
-        # Mock the legacy modules classes
-        self.perceiver_patcher = patch('reverie.backend_server.persona.persona.LegacyPerceiver')
-        self.mock_perceiver_cls = self.perceiver_patcher.start()
-        
-        self.retriever_patcher = patch('reverie.backend_server.persona.persona.LegacyRetriever')
-        self.mock_retriever_cls = self.retriever_patcher.start()
+from helpers import CallRecorder
+
+T_9AM = datetime.datetime(2023, 1, 1, 9, 0)
+T_10AM = datetime.datetime(2023, 1, 1, 10, 0)
+T_11PM = datetime.datetime(2023, 1, 1, 23, 0)
+T_D2 = datetime.datetime(2023, 1, 2, 8, 0)
 
-        self.planner_patcher = patch('reverie.backend_server.persona.persona.LegacyPlanner')
-        self.mock_planner_cls = self.planner_patcher.start()
 
-        self.executor_patcher = patch('reverie.backend_server.persona.persona.LegacyExecutor')
-        self.mock_executor_cls = self.executor_patcher.start()
+_ENTRY_POINTS = (("perceiver", "perceive"), ("retriever", "retrieve"),
+                 ("planner", "plan"), ("executor", "execute"),
+                 ("reflector", "reflect"))
 
-        self.reflector_patcher = patch('reverie.backend_server.persona.persona.LegacyReflector')
-        self.mock_reflector_cls = self.reflector_patcher.start()
 
-        self.converser_patcher = patch('reverie.backend_server.persona.persona.LegacyConverser')
-        self.mock_converser_cls = self.converser_patcher.start()
+def _make_persona(**modules):
+    """
+    Builds a Persona by hand for the move() tests. move() only touches
+    scratch and the one entry point of each cognitive module, so everything
+    else is an empty namespace. Modules not passed in are spec'd Mocks.
+    """
+    for name, entry in _ENTRY_POINTS:
+        if name not in modules:
+            modules[name] = Mock(spec=[entry])
+    return Persona("Klaus", SimpleNamespace(),
+                   SimpleNamespace(curr_tile=None, curr_time=None),
+                   SimpleNamespace(), SimpleNamespace(),
+                   modules["perceiver"], modules["retriever"], modules["planner"],
+                   modules["executor"], modules["reflector"], SimpleNamespace())
 
-    def tearDown(self):
-        self.repo_patcher.stop()
-        self.perceiver_patcher.stop()
-        self.retriever_patcher.stop()
-        self.planner_patcher.stop()
-        self.executor_patcher.stop()
-        self.reflector_patcher.stop()
-        self.converser_patcher.stop()
+
+class TestPersona(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Patch the dependencies once for the class, with a single patcher
+        # for all the classes persona.py imports.
+        cls._patcher = patch.multiple(
+            'reverie.backend_server.persona.persona',
+            JsonMemoryRepository=DEFAULT, LegacyPerceiver=DEFAULT, LegacyRetriever=DEFAULT,
+            LegacyPlanner=DEFAULT, LegacyExecutor=DEFAULT, LegacyReflector=DEFAULT,
+            LegacyConverser=DEFAULT)
+        mocks = cls._patcher.start()
+        cls.mock_repo_cls = mocks["JsonMemoryRepository"]
+        cls.mock_perceiver_cls = mocks["LegacyPerceiver"]
+        cls.mock_retriever_cls = mocks["LegacyRetriever"]
+        cls.mock_planner_cls = mocks["LegacyPlanner"]
+        cls.mock_executor_cls = mocks["LegacyExecutor"]
+        cls.mock_reflector_cls = mocks["LegacyReflector"]
+        cls.mock_converser_cls = mocks["LegacyConverser"]
+        cls.mock_repo = cls.mock_repo_cls.return_value
+
+        # Loading goes entirely through the mocks above, so one Persona
+        # serves every test that needs a loaded one.
+        cls.persona = Persona.create_from_folder("Klaus")
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._patcher.stop()
+
+    def setUp(self):
+        # Saving is the only thing tests do to the shared repository mock
+        self.mock_repo.save_spatial_memory.reset_mock()
+        self.mock_repo.save_associative_memory.reset_mock()
+        self.mock_repo.save_scratch.reset_mock()
 
     def test_initialization(self):
         """
@@ -55,8 +75,6 @@ class TestPersona(unittest.TestCase):
         2. Loads spatial, associative, and scratch memory from the repository.
         3. Initializes all cognitive modules (Perceiver, Retriever, etc.) with scratch.
         """
-        persona = Persona.create_from_folder("Klaus")
-        
         # Verify repository usage
         self.mock_repo_cls.assert_called_once()
         self.mock_repo.load_spatial_memory.assert_called_once()
@@ -79,7 +97,7 @@ class TestPersona(unittest.TestCase):
         It should call save_spatial_memory, save_associative_memory, and save_scratch
         with the correct memory objects and folder path.
         """
-        persona = Persona.create_from_folder("Klaus")
+        persona = self.persona
         save_folder = "test_folder"
         persona.save(save_folder)
         
@@ -94,53 +112,30 @@ class TestPersona(unittest.TestCase):
         - "New day": If the date of the new curr_time differs from scratch.curr_time.
         - False: If the date is the same.
         """
-        # Construct Persona manually with mocks
-        scratch = MagicMock()
-        repo = MagicMock()
-        s_mem = MagicMock()
-        a_mem = MagicMock()
-        perceiver = MagicMock()
-        retriever = MagicMock()
-        planner = MagicMock()
-        executor = MagicMock()
-        reflector = MagicMock()
-        converser = MagicMock()
-        
-        persona = Persona("Klaus", repo, scratch, s_mem, a_mem, 
-                          perceiver, retriever, planner, executor, reflector, converser)
+        persona = _make_persona(planner=SimpleNamespace(plan=CallRecorder()))
+        scratch = persona.scratch
         
         # Setup common args
         curr_tile = (10, 10)
-        maze = MagicMock()
+        maze = SimpleNamespace()
         personas = {}
         
-        # Case 1: First day (curr_time is None)
-        scratch.curr_time = None
-        curr_time = datetime.datetime(2023, 1, 1, 10, 0)
-        
-        persona.move(maze, personas, curr_tile, curr_time)
-        
-        # Check that plan was called with new_day="First day"
-        # plan signature: plan(maze, personas, new_day, retrieved)
-        persona.planner.plan.assert_called()
-        args, _ = persona.planner.plan.call_args
-        self.assertEqual(args[2], "First day")
-        
-        # Case 2: Same day
-        scratch.curr_time = datetime.datetime(2023, 1, 1, 9, 0)
-        curr_time = datetime.datetime(2023, 1, 1, 10, 0)
-        
-        persona.move(maze, personas, curr_tile, curr_time)
-        args, _ = persona.planner.plan.call_args
-        self.assertEqual(args[2], False)
-
-        # Case 3: New day
-        scratch.curr_time = datetime.datetime(2023, 1, 1, 23, 0)
-        curr_time = datetime.datetime(2023, 1, 2, 8, 0)
-        
-        persona.move(maze, personas, curr_tile, curr_time)
-        args, _ = persona.planner.plan.call_args
-        self.assertEqual(args[2], "New day")
+        # (previous curr_time, new curr_time, expected new_day), run in turn
+        # against the one Persona above.
+        cases = [
+            (None, T_10AM, "First day"),
+            (T_9AM, T_10AM, False),
+            (T_11PM, T_D2, "New day"),
+        ]
+        for prev_time, curr_time, expected in cases:
+            with self.subTest(prev_time=prev_time, curr_time=curr_time):
+                scratch.curr_time = prev_time
+                persona.move(maze, personas, curr_tile, curr_time)
+                # plan signature: plan(maze, personas, new_day, retrieved)
+                args, kwargs = persona.planner.plan.last_call
+                self.assertEqual(args[2], expected)
+                self.assertEqual(kwargs, {})
+        self.assertEqual(persona.planner.plan.n, len(cases))
 
     def test_move_execution_flow(self):
         """
@@ -149,52 +144,41 @@ class TestPersona(unittest.TestCase):
         2. Calls perceive() -> retrieve() -> plan() -> reflect() -> execute().
         3. Verifies data is passed correctly between these steps.
         """
-        # Construct Persona manually with mocks
-        scratch = MagicMock()
-        repo = MagicMock()
-        s_mem = MagicMock()
-        a_mem = MagicMock()
-        perceiver = MagicMock()
-        retriever = MagicMock()
-        planner = MagicMock()
-        executor = MagicMock()
-        reflector = MagicMock()
-        converser = MagicMock()
-        
-        persona = Persona("Klaus", repo, scratch, s_mem, a_mem, 
-                          perceiver, retriever, planner, executor, reflector, converser)
-        
-        # Setup mocks
-        maze = MagicMock()
+        # Each step is called once, so plain recorders returning canned
+        # values are enough to verify the data flow.
+        persona = _make_persona(
+            perceiver=SimpleNamespace(perceive=CallRecorder(["perceived_event"])),
+            retriever=SimpleNamespace(retrieve=CallRecorder({"retrieved": "context"})),
+            planner=SimpleNamespace(plan=CallRecorder("action_address")),
+            executor=SimpleNamespace(execute=CallRecorder("execution_details")),
+            reflector=SimpleNamespace(reflect=CallRecorder()),
+        )
+        
+        # Setup args
+        maze = SimpleNamespace()
         personas = {}
         curr_tile = (10, 10)
-        curr_time = datetime.datetime(2023, 1, 1, 10, 0)
-        
-        # Mock return values to verify data flow
-        persona.perceiver.perceive.return_value = ["perceived_event"]
-        persona.retriever.retrieve.return_value = {"retrieved": "context"}
-        persona.planner.plan.return_value = "action_address"
-        persona.executor.execute.return_value = "execution_details"
+        curr_time = T_10AM
         
         result = persona.move(maze, personas, curr_tile, curr_time)
         
         # Verify sequence
-        persona.perceiver.perceive.assert_called_with(maze)
-        persona.retriever.retrieve.assert_called_with(["perceived_event"])
+        self.assertEqual(persona.perceiver.perceive.last_call, ((maze,), {}))
+        self.assertEqual(persona.retriever.retrieve.last_call, ((["perceived_event"],), {}))
         
         # plan args: maze, personas, new_day, retrieved
-        persona.planner.plan.assert_called()
-        self.assertEqual(persona.planner.plan.call_args[0][3], {"retrieved": "context"})
+        self.assertEqual(persona.planner.plan.n, 1)
+        args, kwargs = persona.planner.plan.last_call
+        self.assertEqual(args[3], {"retrieved": "context"})
+        self.assertEqual(kwargs, {})
         
-        persona.reflector.reflect.assert_called_once()
+        self.assertEqual(persona.reflector.reflect.n, 1)
         
-        persona.executor.execute.assert_called_with(maze, personas, "action_address")
+        self.assertEqual(persona.executor.execute.last_call,
+                         ((maze, personas, "action_address"), {}))
         
         self.assertEqual(result, "execution_details")
         
         # Verify state updates
         self.assertEqual(persona.scratch.curr_tile, curr_tile)
         self.assertEqual(persona.scratch.curr_time, curr_time)
-
-if __name__ == '__main__':
-    unittest.main()
@@ -0,0 +1,565 @@
+import unittest
+from unittest.mock import MagicMock, patch
+import os
+import json
+import tempfile
+import datetime
+from types import MappingProxyType, SimpleNamespace
+
+from reverie.backend_server.persona.prompt_template.run_gpt_prompt import (
+    extract_first_json_dict,
+    run_gpt_prompt_event_poignancy_batch,
+    run_gpt_generate_iterative_chat_utt,
+    run_gpt_prompt_pronunciatio,
+    run_gpt_prompt_create_conversation,
+    safe_execute_prompt,
+    get_gpt_param,
+)
+from persona.prompt_template.prompts import (BasePrompt, EventPoignancyBatchPrompt, PoignancyPrompt,
+                                             ExtractKeywordsPrompt, InsightAndGuidancePrompt,
+                                             EventTriplePrompt, TaskDecompPrompt)
+from persona.prompt_template.print_prompt import PromptLogger
+from persona.prompt_template import print_prompt
+from reverie.backend_server.models import EventTriple
+from persona.prompt_template.executor import PromptExecutor
+from reverie.backend_server.infra.llm import LLMService, LLMTimeoutError
+from persona.prompt_template.gpt_structure import (
+    ChatGPT_safe_generate_response_OLD,
+    generate_prompt,
+)
+
+class TestExtractFirstJsonDict(unittest.TestCase):
+    def test_flat_object(self):
+        self.assertEqual(extract_first_json_dict('{"output": "5"}'), {"output": "5"})
+
+    def test_surrounding_text(self):
+        data = 'Sure! Here you go:\n{"utterance": "Hi", "end": false}\nHope that helps.'
+        self.assertEqual(extract_first_json_dict(data), {"utterance": "Hi", "end": False})
+
+    def test_nested_object(self):
+        data = '{"a": {"b": 1}, "c": 2} trailing {"d": 3}'
+        self.assertEqual(extract_first_json_dict(data), {"a": {"b": 1}, "c": 2})
+
+    def test_braces_inside_strings(self):
+        data = '{"utterance": "a } brace and an escaped \\" quote {", "end": true}'
+        self.assertEqual(extract_first_json_dict(data),
+                         {"utterance": 'a } brace and an escaped " quote {', "end": True})
+
+    def test_stray_quote_before_object(self):
+        data = 'Klaus says "hi {"utterance": "Hi", "end": false}'
+        self.assertEqual(extract_first_json_dict(data), {"utterance": "Hi", "end": False})
+
+    def test_no_object(self):
+        self.assertIsNone(extract_first_json_dict("no json here"))
+        self.assertIsNone(extract_first_json_dict('{"unterminated": 1'))
+
+    def test_invalid_json(self):
+        self.assertIsNone(extract_first_json_dict("{not: valid}"))
+
+    def test_lenient_fallback(self):
+        # orjson rejects NaN; the stdlib parser still accepts it
+        data = extract_first_json_dict('{"score": NaN}')
+        self.assertNotEqual(data["score"], data["score"])
+
+class TestChatGPTSafeGenerateResponse(unittest.TestCase):
+    @patch('persona.prompt_template.gpt_structure.ChatGPT_request')
+    def test_parses_each_response_once(self, mock_request):
+        """
+        func_parse runs once per attempt and both validate and clean_up
+        receive the parsed object.
+        """
+        mock_request.return_value = ' {"output": "7"} '
+        parse = MagicMock(side_effect=extract_first_json_dict)
+        validate = MagicMock(return_value=True)
+
+        output = ChatGPT_safe_generate_response_OLD(
+            "prompt", 3, None, validate, lambda r, prompt="": r["output"],
+            func_parse=parse)
+
+        self.assertEqual(output, "7")
+        parse.assert_called_once_with('{"output": "7"}')
+        validate.assert_called_once_with({"output": "7"}, prompt="prompt")
+
+class TestIterativeChatUttPromptInput(unittest.TestCase):
+    def setUp(self):
+        self.now = datetime.datetime(2023, 2, 13, 12, 0)
+        self.maze = MagicMock()
+        self.maze.access_tile.return_value = {"sector": "cafe", "arena": "kitchen"}
+        self.target = SimpleNamespace(scratch=SimpleNamespace(name="Bob"))
+
+    def _make_persona(self, seq_chat):
+        scratch = SimpleNamespace(name="Alice", curr_time=self.now, curr_tile=(1, 2),
+                                  get_str_iss=lambda: "Alice is a baker.")
+        return SimpleNamespace(scratch=scratch, a_mem=SimpleNamespace(seq_chat=seq_chat))
+
+    def _chat(self, obj, minutes_ago, description):
+        return SimpleNamespace(object=obj, description=description,
+                               created=self.now - datetime.timedelta(minutes=minutes_ago))
+
+    def _prompt_input(self, persona):
+        module = 'reverie.backend_server.persona.prompt_template.run_gpt_prompt'
+        with patch(module + '.generate_prompt', return_value="prompt"), \
+             patch(module + '.ChatGPT_safe_generate_response_OLD',
+                   return_value={"utterance": "Hi", "end": False}):
+            _, details = run_gpt_generate_iterative_chat_utt(
+                self.maze, persona, self.target, {}, "context", [])
+        return details[3]
+
+    def test_uses_first_matching_previous_chat(self):
+        persona = self._make_persona([
+            self._chat("Carol", 30, "talking about bread."),
+            self._chat("Bob", 20, "talking about cake."),
+            self._chat("Bob", 10, "talking about pie."),
+        ])
+        prompt_input = self._prompt_input(persona)
+        self.assertEqual(prompt_input[3],
+                         "\n20 minutes ago, Alice and Bob were already talking about cake. "
+                         "This context takes place after that conversation.")
+        self.assertEqual(prompt_input[4], "kitchen in cafe")
+        self.assertEqual(prompt_input[8], "[The conversation has not started yet -- start it!]")
+
+    def test_drops_previous_chat_after_eight_hours(self):
+        persona = self._make_persona([self._chat("Bob", 481, "talking about cake.")])
+        self.assertEqual(self._prompt_input(persona)[3], "")
+
+    def test_no_previous_chat_with_target(self):
+        persona = self._make_persona([self._chat("Carol", 5, "talking about bread.")])
+        self.assertEqual(self._prompt_input(persona)[3], "")
+
+    def test_fail_safe_is_shared_and_read_only(self):
+        persona = self._make_persona([])
+        module = 'reverie.backend_server.persona.prompt_template.run_gpt_prompt'
+        with patch(module + '.generate_prompt', return_value="prompt"), \
+             patch(module + '.ChatGPT_safe_generate_response_OLD',
+                   side_effect=lambda prompt, repeat, fail_safe, *args, **kwargs: fail_safe):
+            first, _ = run_gpt_generate_iterative_chat_utt(
+                self.maze, persona, self.target, {}, "context", [])
+            second, _ = run_gpt_generate_iterative_chat_utt(
+                self.maze, persona, self.target, {}, "context", [])
+        self.assertIs(first, second)
+        self.assertEqual(dict(first), {"utterance": "...", "end": False})
+        with self.assertRaises(TypeError):
+            first["end"] = True
+
+
+class TestEventPoignancyBatch(unittest.TestCase):
+    def test_clean_up_aligns_with_events(self):
+        prompt = EventPoignancyBatchPrompt(MagicMock(), ["a", "b", "c"])
+        self.assertEqual(prompt.clean_up("[3, 7, 1]"), [3, 7, 1])
+        self.assertEqual(prompt.clean_up([3, "7", 1]), [3, 7, 1])
+
+    def test_validate_rejects_out_of_scale_ratings(self):
+        prompt = EventPoignancyBatchPrompt(MagicMock(), ["a", "b"])
+        self.assertFalse(prompt.validate("[3, 11]"))
+        self.assertFalse(prompt.validate("[0, 4]"))
+
+    def test_validate_rejects_wrong_length(self):
+        prompt = EventPoignancyBatchPrompt(MagicMock(), ["a", "b", "c"])
+        self.assertFalse(prompt.validate("[3, 7]"))
+        self.assertEqual(prompt.get_fail_safe(), [4, 4, 4])
+
+    @patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.prompt_executor')
+    def test_empty_batch_skips_llm(self, mock_executor):
+        output, _ = run_gpt_prompt_event_poignancy_batch(MagicMock(), [])
+        self.assertEqual(output, [])
+        mock_executor.execute.assert_not_called()
+
+    @patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.DEBUG', False)
+    @patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.generate_prompt',
+           return_value="prompt")
+    @patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.prompt_executor')
+    def test_idle_events_keep_a_fixed_score(self, mock_executor, _):
+        mock_executor.execute.return_value = [6, 8]
+        output, _ = run_gpt_prompt_event_poignancy_batch(
+            MagicMock(), ["bed is idle", "Klaus is reading", "desk is idle", "Maria is singing"])
+        self.assertEqual(output, [1, 6, 1, 8])
+        self.assertEqual(mock_executor.execute.call_args.args[0].event_descriptions,
+                         ["Klaus is reading", "Maria is singing"])
+
+    @patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.prompt_executor')
+    def test_all_idle_skips_llm(self, mock_executor):
+        output, _ = run_gpt_prompt_event_poignancy_batch(MagicMock(), ["bed is idle"])
+        self.assertEqual(output, [1])
+        mock_executor.execute.assert_not_called()
+
+class TestPromptTimeouts(unittest.TestCase):
+    module = 'reverie.backend_server.persona.prompt_template.run_gpt_prompt'
+
+    @patch(module + '.DEBUG', False)
+    @patch(module + '.generate_prompt', return_value="prompt")
+    @patch(module + '.prompt_executor')
+    def test_short_prompts_get_short_timeouts(self, mock_executor, _):
+        mock_executor.execute.return_value = "🙂"
+        run_gpt_prompt_pronunciatio("eating", MagicMock())
+        self.assertAlmostEqual(mock_executor.execute.call_args.kwargs["request_timeout"], 4.5)
+
+    @patch(module + '.DEBUG', False)
+    @patch(module + '.generate_prompt', return_value="prompt")
+    @patch(module + '.prompt_executor')
+    def test_class_timeout_overrides_token_estimate(self, mock_executor, _):
+        mock_executor.execute.return_value = "..."
+        run_gpt_prompt_create_conversation(MagicMock(), MagicMock(), "cafe")
+        self.assertEqual(mock_executor.execute.call_args.kwargs["request_timeout"], 30)
+
+    @patch('time.sleep')
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_timeouts_count_against_the_prompts_attempts(self, _, sleep):
+        class ShortPrompt(BasePrompt):
+            def create_prompt_input(self, test_input=None):
+                return []
+
+            def get_fail_safe(self):
+                return "fail safe"
+
+        provider = MagicMock()
+        provider.chat_completion.side_effect = LLMTimeoutError("timed out")
+        timeouts = []
+        executor = PromptExecutor(LLMService(provider),
+                                  on_timeout=lambda *args: timeouts.append(args))
+        prompt = ShortPrompt(MagicMock())
+
+        output = executor.execute(prompt, model="gpt-3.5-turbo", max_retries=2,
+                                  request_timeout=4.5)
+
+        self.assertEqual(output, "fail safe")
+        self.assertEqual(provider.chat_completion.call_count, 3)
+        self.assertEqual(timeouts, [(prompt, 1, 4.5), (prompt, 2, 4.5), (prompt, 3, 4.5)])
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch(module + '.DEBUG', True)
+    @patch(module + '.log_prompt_timeout')
+    @patch(module + '.generate_prompt', return_value="prompt")
+    @patch('time.sleep')
+    def test_conversation_requests_time_out(self, _, __, log_timeout):
+        provider = MagicMock()
+        provider.chat_completion.side_effect = LLMTimeoutError("timed out")
+        persona = MagicMock()
+        persona.a_mem.seq_chat = []
+        persona.scratch.get_str_iss.return_value = ""
+        maze = MagicMock()
+        maze.access_tile.return_value = {"sector": "cafe", "arena": "kitchen"}
+
+        with patch('persona.prompt_template.gpt_structure.llm_service', LLMService(provider)):
+            output, _ = run_gpt_generate_iterative_chat_utt(maze, persona, MagicMock(), {}, "", [])
+
+        self.assertEqual(dict(output), {"utterance": "...", "end": False})
+        self.assertEqual([c.kwargs["request_timeout"] for c in provider.chat_completion.call_args_list],
+                         [30, 30, 30])
+        self.assertEqual([c.args[1:] for c in log_timeout.call_args_list],
+                         [(persona, 30, 1), (persona, 30, 2), (persona, 30, 3)])
+
+
+class TestExecuteChatSafe(unittest.TestCase):
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_chat_json_output_is_decoded(self, _):
+        service = MagicMock()
+        service.chat_completion.return_value = '{"output": "7"} and some trailing text'
+        prompt = PoignancyPrompt(MagicMock(), "eating", "event")
+        self.assertEqual(PromptExecutor(service).execute(prompt), 7)
+
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_wraps_prompt_with_json_instruction(self, _):
+        service = MagicMock()
+        service.chat_completion.return_value = '{"output": "7"}'
+        PromptExecutor(service).execute(PoignancyPrompt(MagicMock(), "eating", "event"))
+        content = service.chat_completion.call_args.kwargs["messages"][0]["content"]
+        self.assertEqual(content,
+                         '"""\ntext\n"""\n'
+                         'Output the response to the prompt above in json. '
+                         'The output should ONLY contain ONE integer value on the scale of 1 to 10.\n'
+                         'Example output json:\n{"output": "5"}')
+
+
+class TestPoignancyRating(unittest.TestCase):
+    def test_accepts_str_and_int_ratings(self):
+        prompt = PoignancyPrompt(MagicMock(), "eating", "event")
+        self.assertEqual(prompt.clean_up(" 7 "), 7)
+        self.assertEqual(prompt.clean_up(3), 3)
+
+    def test_rejects_ratings_off_the_scale(self):
+        prompt = PoignancyPrompt(MagicMock(), "eating", "event")
+        self.assertFalse(prompt.validate("0"))
+        self.assertFalse(prompt.validate("11"))
+        self.assertTrue(prompt.validate("10"))
+
+    def test_rejects_non_int_json_values(self):
+        prompt = PoignancyPrompt(MagicMock(), "eating", "event")
+        self.assertFalse(prompt.validate(True))
+        self.assertFalse(prompt.validate(5.0))
+
+    def test_kind_selects_template(self):
+        for kind in ("event", "thought", "chat"):
+            prompt = PoignancyPrompt(MagicMock(), "eating", kind)
+            self.assertTrue(prompt.prompt_template.endswith(f"poignancy_{kind}_v1.txt"))
+
+
+class TestReflectionOutputs(unittest.TestCase):
+    def test_keywords_are_an_ordered_list_without_duplicates(self):
+        prompt = ExtractKeywordsPrompt(MagicMock(), "eating")
+        keywords = prompt.clean_up("Lunch, Cafe.\nEmotive keywords: happy, lunch")
+        self.assertEqual(keywords, ["lunch", "cafe", "happy"])
+
+    def test_insights_are_parallel_thought_and_evidence_lists(self):
+        prompt = InsightAndGuidancePrompt(MagicMock(), "", 2)
+        thoughts, evidence = prompt.clean_up("Klaus likes books (because of 0, 2)\n"
+                                             "2. Klaus is tired (because of 1)")
+        self.assertEqual(thoughts, ["Klaus likes books", "Klaus is tired"])
+        self.assertEqual(evidence, [[0, 2], [1]])
+
+
+class TestEventTriple(unittest.TestCase):
+    def test_clean_up_returns_named_triple(self):
+        persona = MagicMock()
+        persona.name = "Isabella Rodriguez"
+        triple = EventTriplePrompt(persona, "brewing coffee").clean_up(" is, brewing coffee)")
+        self.assertEqual(triple.predicate, "is")
+        self.assertEqual(triple.object, "brewing coffee")
+        self.assertEqual(triple, ("Isabella Rodriguez", "is", "brewing coffee"))
+
+
+class TestTaskDecompCleanUp(unittest.TestCase):
+    PROMPT = "... (total duration in minutes 60):"
+
+    def clean_up(self, response, duration=60):
+        return TaskDecompPrompt(MagicMock(), "working", duration).clean_up(response, self.PROMPT)
+
+    def test_rounds_down_and_stretches_last_task(self):
+        response = ("writing (duration in minutes: 22, minutes left: 38)\n"
+                    "2) Klaus is reading (duration in minutes: 27, minutes left: 11)")
+        self.assertEqual(self.clean_up(response),
+                         [["working (writing)", 20], ["working (reading)", 40]])
+
+    def test_overlong_schedule_ends_with_task_at_minute_60(self):
+        response = ("writing (duration in minutes: 40, minutes left: 20)\n"
+                    "2) Klaus is reading (duration in minutes: 30, minutes left: 0)\n"
+                    "3) Klaus is writing (duration in minutes: 5, minutes left: 0)")
+        self.assertEqual(self.clean_up(response, duration=75),
+                         [["working (writing)", 40], ["working (reading)", 35]])
+
+
+class TestCleanUpReuse(unittest.TestCase):
+    class CountingPrompt(BasePrompt):
+        calls = 0
+
+        def create_prompt_input(self, test_input=None):
+            return []
+
+        def clean_up(self, llm_response, prompt=""):
+            type(self).calls += 1
+            return int(llm_response.strip())
+
+        def get_fail_safe(self):
+            return 0
+
+    def setUp(self):
+        self.CountingPrompt.calls = 0
+
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_validated_response_is_parsed_once(self, _):
+        service = MagicMock()
+        service.provider.completion.return_value = (" 5", {})
+        output = PromptExecutor(service).execute(self.CountingPrompt(MagicMock()),
+                                                 model="gpt-3.5-turbo-instruct")
+        self.assertEqual(output, 5)
+        self.assertEqual(self.CountingPrompt.calls, 1)
+
+    def test_clean_up_is_not_memoized(self):
+        prompt = self.CountingPrompt(MagicMock())
+        prompt.clean_up("5")
+        prompt.clean_up("5")
+        self.assertEqual(self.CountingPrompt.calls, 2)
+
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_rejected_response_gets_the_fail_safe(self, _):
+        class RejectingPrompt(self.CountingPrompt):
+            def validate(self, llm_response, prompt=""):
+                return False
+
+        service = MagicMock()
+        service.provider.completion.return_value = (" 5", {})
+        output = PromptExecutor(service).execute(RejectingPrompt(MagicMock()),
+                                                 model="gpt-3.5-turbo-instruct", max_retries=1)
+        self.assertEqual(output, 0)
+        self.assertEqual(service.provider.completion.call_count, 2)
+        self.assertEqual(self.CountingPrompt.calls, 0)
+
+
+class TestPromptInputReuse(unittest.TestCase):
+    class CountingPrompt(BasePrompt):
+        def __init__(self, persona):
+            super().__init__(persona)
+            self.builds = 0
+
+        def create_prompt_input(self, test_input=None):
+            self.builds += 1
+            return ["input"]
+
+        def clean_up(self, llm_response, prompt=""):
+            return int(llm_response.strip())
+
+        def get_fail_safe(self):
+            return 0
+
+    @patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.DEBUG', False)
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_debug_info_reuses_the_executor_prompt(self, _):
+        service = MagicMock()
+        service.provider.completion.return_value = (" 5", {})
+        prompt = self.CountingPrompt(MagicMock())
+        with patch('reverie.backend_server.persona.prompt_template.run_gpt_prompt.prompt_executor',
+                   PromptExecutor(service)):
+            output, details = safe_execute_prompt(prompt, get_gpt_param())
+        self.assertEqual(output, 5)
+        self.assertEqual(details[1], "text")
+        self.assertEqual(details[3], ["input"])
+        self.assertEqual(prompt.builds, 1)
+
+
+class TestExecuteBatch(unittest.TestCase):
+    def _make_prompt(self, statements):
+        prompt = MagicMock(example_output=None, special_instruction=None, statements=statements)
+        prompt.validate.side_effect = lambda response, prompt="": response != "bad"
+        prompt.clean_up.side_effect = lambda response, prompt="": response.upper()
+        prompt.get_fail_safe.return_value = "fail safe"
+        return prompt
+
+    @patch('persona.prompt_template.executor.generate_prompt',
+           side_effect=lambda prompt_input, template: prompt_input)
+    def test_batches_completions_and_retries_failures(self, _):
+        service = MagicMock()
+        service.completion.side_effect = [["a", "bad", "c"], ["b"]]
+        prompts = [self._make_prompt(s) for s in ("p0", "p1", "p2")]
+        for prompt in prompts:
+            prompt.create_prompt_input.return_value = prompt.statements
+
+        outputs = PromptExecutor(service).execute_batch(prompts, model="gpt-3.5-turbo-instruct")
+
+        self.assertEqual(outputs, ["A", "B", "C"])
+        self.assertEqual([c.kwargs["prompt"] for c in service.completion.call_args_list],
+                         [["p0", "p1", "p2"], ["p1"]])
+
+    @patch('persona.prompt_template.executor.generate_prompt',
+           side_effect=lambda prompt_input, template: prompt_input)
+    def test_prompts_without_a_response_are_retried(self, _):
+        service = MagicMock()
+        service.completion.side_effect = [["a"], ["b"]]
+        prompts = [self._make_prompt(s) for s in ("p0", "p1")]
+        for prompt in prompts:
+            prompt.create_prompt_input.return_value = prompt.statements
+
+        outputs = PromptExecutor(service).execute_batch(prompts, model="gpt-3.5-turbo-instruct")
+
+        self.assertEqual(outputs, ["A", "B"])
+        self.assertEqual(service.completion.call_args.kwargs["prompt"], ["p1"])
+
+    @patch('persona.prompt_template.executor.generate_prompt',
+           side_effect=lambda prompt_input, template: prompt_input)
+    def test_missing_or_failing_responses_get_the_fail_safe(self, _):
+        service = MagicMock()
+        service.completion.return_value = ["a"]
+        prompts = [self._make_prompt(s) for s in ("p0", "p1")]
+        for prompt in prompts:
+            prompt.create_prompt_input.return_value = prompt.statements
+        prompts[0].clean_up.side_effect = ValueError("unparsable")
+
+        outputs = PromptExecutor(service).execute_batch(prompts, model="gpt-3.5-turbo-instruct",
+                                                        max_retries=1)
+
+        self.assertEqual(outputs, ["fail safe", "fail safe"])
+
+    @patch('persona.prompt_template.executor.generate_prompt', return_value="text")
+    def test_falls_back_to_fail_safe(self, _):
+        service = MagicMock()
+        service.completion.return_value = ["bad"]
+        outputs = PromptExecutor(service).execute_batch([self._make_prompt("p0")],
+                                                        model="gpt-3.5-turbo-instruct",
+                                                        max_retries=1)
+        self.assertEqual(outputs, ["fail safe"])
+        self.assertEqual(service.completion.call_count, 2)
+
+    def test_chat_models_run_one_by_one(self):
+        executor = PromptExecutor(MagicMock())
+        executor.execute = MagicMock(side_effect=["x", "y"])
+        outputs = executor.execute_batch([self._make_prompt("p0"), self._make_prompt("p1")],
+                                         model="gpt-3.5-turbo")
+        self.assertEqual(outputs, ["x", "y"])
+        self.assertEqual(executor.execute.call_count, 2)
+
+
+class TestGeneratePrompt(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "prompt.txt")
+        self._write("Variables: \n!<INPUT 0>! -- name\n"
+                    "<commentblockmarker>###</commentblockmarker>\n"
+                    "Hi !<INPUT 0>!, meet !<INPUT 1>!. Bye !<INPUT 0>! (!<INPUT 2>!)\n")
+
+    def tearDown(self):
+        self.test_dir.cleanup()
+
+    def _write(self, text):
+        with open(self.path, "w") as f:
+            f.write(text)
+
+    def test_fills_slots_and_drops_header(self):
+        self.assertEqual(generate_prompt(["Klaus", 3, "x"], self.path),
+                         "Hi Klaus, meet 3. Bye Klaus (x)")
+
+    def test_missing_input_keeps_placeholder(self):
+        self.assertEqual(generate_prompt("Klaus", self.path),
+                         "Hi Klaus, meet !<INPUT 1>!. Bye Klaus (!<INPUT 2>!)")
+
+    def test_reloads_when_file_changes(self):
+        generate_prompt(["a", "b", "c"], self.path)
+        self._write("New !<INPUT 0>!")
+        os.utime(self.path, (0, 0))
+        self.assertEqual(generate_prompt(["a"], self.path), "New a")
+
+class TestPromptLogger(unittest.TestCase):
+    def setUp(self):
+        PromptLogger._instance = None
+        self.test_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.test_dir.name, "logs", "prompts.jsonl")
+
+    def tearDown(self):
+        PromptLogger().close()
+        PromptLogger._instance = None
+        self.test_dir.cleanup()
+
+    def test_logs_frozen_mappings_as_objects(self):
+        logger = PromptLogger(self.path, flush_every=1)
+        logger.log({"output": MappingProxyType({"utterance": "...", "end": False})})
+        logger.close()
+        with open(self.path) as f:
+            self.assertEqual(json.loads(f.readline())["output"], {"utterance": "...", "end": False})
+
+    def test_appends_jsonl_records(self):
+        logger = PromptLogger(self.path, flush_every=2)
+        self.assertIs(PromptLogger(), logger)
+
+        logger.log({"prompt": "a", "output": {"x"}})
+        self.assertFalse(os.path.getsize(self.path))
+        logger.log({"prompt": "b", "output": 3})
+
+        with open(self.path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["prompt"] for r in records], ["a", "b"])
+        self.assertEqual(records[0]["output"], "{'x'}")
+
+    def test_logs_timeouts(self):
+        PromptLogger(self.path, flush_every=1)
+        print_prompt.log_prompt_timeout("pronunciatio.txt", SimpleNamespace(name="Klaus"), 4.5, 2)
+        with open(self.path) as f:
+            record = json.loads(f.readline())
+        self.assertEqual({k: record[k] for k in ("event", "prompt_template", "persona", "timeout", "attempt")},
+                         {"event": "timeout", "prompt_template": "pronunciatio.txt",
+                          "persona": "Klaus", "timeout": 4.5, "attempt": 2})
+
+    def test_json_fallback_writes_the_same_record(self):
+        record = {"output": EventTriple("Isabella", "is", "idle"), "scores": {1: 5}}
+        logger = PromptLogger(self.path)
+        fast = logger._dumps(record)
+        with patch.object(print_prompt, "orjson", None):
+            self.assertEqual(json.loads(logger._dumps(record)), json.loads(fast))
+        self.assertEqual(json.loads(fast),
+                         {"output": ["Isabella", "is", "idle"], "scores": {"1": 5}})